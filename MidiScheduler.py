@@ -1,15 +1,18 @@
 import threading
 import heapq
+import itertools
 import time
 import mido
 
 
 class MidiScheduler:
     def __init__(self):
-        self._queue = []  # Min-heap for events: (timestamp, msg)
+        self._queue = []  # Min-heap for events: (timestamp, seq, raw_bytes)
+        self._seq = itertools.count()  # Tie-breaker: equal timestamps go out in scheduling order
         self._condition = threading.Condition()  # For efficient sleeping
         self._active = True
         self.output_port = None
+        self._send_bytes = None  # Fastest raw-bytes sender for output_port, see _raw_sender
 
         # Start the single background worker
         self._worker_thread = threading.Thread(target=self._process_queue, daemon=True)
@@ -19,53 +22,98 @@ class MidiScheduler:
         """Updates the output port immediately."""
         with self._condition:
             self.output_port = port
+            self._send_bytes = self._raw_sender(port)
+
+    @staticmethod
+    def _raw_sender(port):
+        """
+        Returns a callable that pushes raw MIDI bytes into the port.
+        On the RtMidi backend this goes straight to rtmidi's send_message, skipping
+        mido.Message construction, validation and re-encoding entirely.
+        """
+        if port is None:
+            return None
+
+        rt = getattr(port, '_rt', None)
+        if rt is not None and hasattr(rt, 'send_message'):
+            send_message = rt.send_message
+            # Share mido's lock so we stay serialized with anyone else calling port.send()
+            lock = getattr(port, '_send_lock', None) or threading.Lock()
+
+            def send(data):
+                with lock:
+                    send_message(data)
+
+            return send
+
+        # Any other backend: go through the public API
+        from_bytes = mido.Message.from_bytes
+        return lambda data: port.send(from_bytes(data))
 
     def play_note(self, note, velocity, channel, duration):
         """
         1. Sends Note On INSTANTLY (Zero Latency).
         2. Schedules Note Off for later.
         """
-        if not self.output_port:
+        send = self._send_bytes
+        if not send:
             return
 
+        # Adjust channel (MIDI is 0-15, your Logic is 1-16)
+        # Raw bytes skip mido's range checks, so mask here: an out-of-range value
+        # must not bleed into the status nibble or turn a data byte into a status byte
+        ch = (channel - 1) & 0x0F
+        note &= 0x7F
+        velocity &= 0x7F
+
         # --- A. IMMEDIATE OUTPUT (The Latency Fix) ---
         # We send this right now. No worker, no queue, no waiting.
-        # Note: Mido output is thread-safe on RtMidi backend.
-        # Adjust channel (Mido is 0-15, your Logic is 1-16)
-        msg_on = mido.Message('note_on', note=note, velocity=velocity, channel=channel - 1)
-        self.output_port.send(msg_on)
+        # Raw status/data bytes: 0x90 = Note On, 0x80 = Note Off
+        send((0x90 | ch, note, velocity))
 
         # --- B. SCHEDULE CLEANUP ---
         # Calculate when the note should end
-        off_time = time.time() + duration
-        msg_off = mido.Message('note_off', note=note, velocity=0, channel=channel - 1)
+        # (monotonic clock: wall-clock jumps from NTP can't strand or cut notes)
+        off_time = time.monotonic() + duration
+
+        event = (off_time, next(self._seq), (0x80 | ch, note, 0))
 
         with self._condition:
             # Add to priority queue
-            heapq.heappush(self._queue, (off_time, msg_off))
-            # Wake up the worker if this new note ends sooner than the current sleeper
-            self._condition.notify()
+            heapq.heappush(self._queue, event)
+            # Wake up the worker only if this new note ends sooner than the current sleeper.
+            # Otherwise it is already sleeping on an earlier deadline and will get to this one.
+            if self._queue[0] is event:
+                self._condition.notify()
 
     def _process_queue(self):
         """Single background thread that waits for the next Note Off."""
+        queue = self._queue
         while self._active:
             with self._condition:
-                if not self._queue:
+                if not queue:
                     # Nothing to do? Sleep until a note is played.
                     self._condition.wait()
-                else:
-                    # Look at the earliest event
-                    next_time, _ = self._queue[0]
-                    now = time.time()
-
-                    if next_time <= now:
-                        # It's time! Pop and Send.
-                        _, msg = heapq.heappop(self._queue)
-                        if self.output_port:
-                            self.output_port.send(msg)
-                    else:
-                        # Sleep exactly until the next event is due
-                        self._condition.wait(timeout=next_time - now)
+                    continue
+
+                # Collect everything that is due in one go, so a burst of
+                # note-offs costs one wake-up instead of one per note.
+                now = time.monotonic()
+                due = []
+                while queue and queue[0][0] <= now:
+                    due.append(heapq.heappop(queue)[2])
+
+                if not due:
+                    # Sleep exactly until the next event is due
+                    self._condition.wait(timeout=queue[0][0] - now)
+                    continue
+
+                send = self._send_bytes
+
+            # Send outside the lock so play_note() is never blocked on MIDI I/O
+            if send:
+                for data in due:
+                    send(data)
 
     def stop(self):
         self._active = False
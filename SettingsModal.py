@@ -1,17 +1,24 @@
 import mido
 import time
-from datetime import datetime
+from textual import work
 from textual.app import ComposeResult
 from textual.screen import ModalScreen
 from textual.widgets import Button, Input, Label, Select, RichLog
 from textual.containers import Grid, Container, Horizontal, Vertical
 
+from performance_settings import PerformanceSettings
+
 
 class SettingsScreen(ModalScreen):
     """A modal screen for configuring MIDI settings."""
 
     BINDINGS = [("escape", "dismiss", "Close")]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Incoming notes waiting to be written to the MIDI monitor: (timestamp, note)
+        self._monitor_buffer = []
+
     def compose(self) -> ComposeResult:
         with Container(id="dialog"):
             with Horizontal(id="dialog_body"):
@@ -59,6 +66,26 @@ class SettingsScreen(ModalScreen):
         self.query_one("#snare_input").value = str(settings.snare_note)
         self.query_one("#rim_input").value = str(settings.rim_note)
 
+        # Port enumeration can stall for tens of ms on some backends: keep it off the UI thread
+        self.load_ports()
+
+        # Drum bursts would otherwise re-render the monitor once per note
+        self.set_interval(0.05, self.flush_monitor)
+
+    def on_screen_resume(self) -> None:
+        # Tell the app a screen with handle_midi_input is active, so the RtMidi
+        # thread only dispatches notes to the UI while someone is listening
+        self.app.screen_handles_midi = True
+
+    def on_screen_suspend(self) -> None:
+        self.app.screen_handles_midi = False
+
+    def on_unmount(self) -> None:
+        self.app.screen_handles_midi = False
+
+    @work(thread=True, exclusive=True)
+    def load_ports(self) -> None:
+        """Enumerates MIDI ports in a worker thread and hands the result back to the UI."""
         try:
             inputs = [(name, name) for name in mido.get_input_names()]
             outputs = [(name, name) for name in mido.get_output_names()]
@@ -66,6 +93,14 @@ class SettingsScreen(ModalScreen):
             inputs = []
             outputs = []
 
+        self.app.call_from_thread(self.populate_ports, inputs, outputs)
+
+    def populate_ports(self, inputs, outputs) -> None:
+        """Fills the port selectors. Runs on the main thread."""
+        if not self.is_attached:
+            # The modal was closed before the scan finished
+            return
+
         input_sel = self.query_one("#input_selector", Select)
         input_sel.set_options(inputs)
 
@@ -97,9 +132,8 @@ class SettingsScreen(ModalScreen):
         port = self.app.current_output_port
         if port:
             try:
-                port.send(mido.Message('note_on', note=60, velocity=100))
-                time.sleep(0.1)
-                port.send(mido.Message('note_off', note=60, velocity=0))
+                # The scheduler sends the note-off from its own thread, so the UI never blocks
+                self.app.midi_scheduler.play_note(note=60, velocity=100, channel=1, duration=0.1)
                 self.notify("Sent Test Note (C4)")
             except Exception as e:
                 self.notify(f"Error: {e}", severity="error")
@@ -108,20 +142,45 @@ class SettingsScreen(ModalScreen):
 
     def save_and_close(self):
         try:
-            self.app.settings.kick_note = int(self.query_one("#kick_input").value)
-            self.app.settings.snare_note = int(self.query_one("#snare_input").value)
-            self.app.settings.rim_note = int(self.query_one("#rim_input").value)
-            self.dismiss()
-            self.notify("Settings Saved!")
+            kick = int(self.query_one("#kick_input").value)
+            snare = int(self.query_one("#snare_input").value)
+            rim = int(self.query_one("#rim_input").value)
         except ValueError:
             self.notify("Please enter valid integers", severity="error")
+            return
+
+        try:
+            # Build the new mapping completely, then publish it with one reference store
+            self.app.settings = PerformanceSettings(kick_note=kick, snare_note=snare, rim_note=rim)
+        except ValueError as e:
+            # Out-of-range note; the message names the offending value
+            self.notify(str(e), severity="error")
+            return
+
+        self.dismiss()
+        self.notify("Settings Saved!")
 
     def handle_midi_input(self, note: int) -> None:
-        log = self.query_one("#midi_monitor", RichLog)
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log.write(f"[{timestamp}] Note On: [bold cyan]{note}[/]")
+        self._monitor_buffer.append((time.time(), note))
 
         focused_widget = self.focused
         if isinstance(focused_widget, Input):
             focused_widget.value = str(note)
-            self.notify(f"Mapped Note {note}")
\ No newline at end of file
+            self.notify(f"Mapped Note {note}")
+
+    def flush_monitor(self) -> None:
+        """Writes all buffered notes to the MIDI monitor in a single RichLog update."""
+        if not self._monitor_buffer:
+            return
+
+        lines = []
+        last_second = None
+        for t, note in self._monitor_buffer:
+            second = int(t)
+            if second != last_second:
+                last_second = second
+                timestamp = time.strftime("%H:%M:%S", time.localtime(second))
+            lines.append(f"[{timestamp}] Note On: [bold cyan]{note}[/]")
+        self._monitor_buffer.clear()
+
+        self.query_one("#midi_monitor", RichLog).write("\n".join(lines))
@@ -1,22 +1,85 @@
 import random
+from bisect import bisect
+from itertools import accumulate
+
+import numpy as np
 
 from bayesian.bayesian_network_helpers import *
 
+
+def _cumulative(weights):
+    """Turns raw weights into a normalized cumulative tuple ending exactly at 1.0."""
+    cum = tuple(accumulate(weights))
+    total = cum[-1]
+    return tuple(c / total for c in cum[:-1]) + (1.0,)
+
+
+def _dense_cum(choices, cum, domain):
+    """Expands a sparse (choices, cum) entry into a cumulative row over the full domain."""
+    probs = dict.fromkeys(domain, 0.0)
+    prev = 0.0
+    for choice, c in zip(choices, cum):
+        probs[choice] += c - prev
+        prev = c
+    return _cumulative(probs.values())
+
+
+# Chord enum -> dense index (ChordType values are scale degrees, not 0..3)
+_CHORDS = (ChordType.I, ChordType.IV, ChordType.V, ChordType.VI)
+_DENSITIES = tuple(DensityLevel)
+_ENERGIES = tuple(EnergyLevel)
+_PITCH_FUNCS = tuple(PitchFunc)
+
+# (Chord, PitchFunc, Channel) -> (notes, cum_weights); this network plays everything untransposed
+_PITCH_TABLE = build_pitch_table({1: 0, 2: 0})
+
+# VELOCITY_TABLE as an array, for infer_batch()
+_VELOCITY_ARRAY = np.array(VELOCITY_TABLE, dtype=np.intp)
+
+# STEP_TO_BEAT as an array, for infer_batch() (index = step - 1)
+_STEP_BEAT_ARRAY = np.array(STEP_TO_BEAT, dtype=np.intp)
+
+# PITCH_INTERVALS as [PitchFunc] rows padded to the longest candidate list, for infer_batch().
+# Padding repeats the last interval with cum weight 1.0, so it can never be drawn.
+_INTERVAL_WIDTH = max(len(intervals) for intervals, _ in PITCH_INTERVALS.values())
+_INTERVAL_ARRAY = np.array([
+    PITCH_INTERVALS[func][0] + PITCH_INTERVALS[func][0][-1:] * (_INTERVAL_WIDTH - len(PITCH_INTERVALS[func][0]))
+    for func in PitchFunc
+], dtype=np.intp)
+_INTERVAL_CUM = np.array([
+    PITCH_INTERVALS[func][1] + (1.0,) * (_INTERVAL_WIDTH - len(PITCH_INTERVALS[func][1]))
+    for func in PitchFunc
+])
+
+# Shared result for every rest decision (BayesianOutput is frozen)
+_REST_OUTPUT = BayesianOutput(False, 0, 0, 0, 0, "Rest")
+
+
 class BayesianMusicGenerator:
-    def __init__(self):
-        # We pre-split data into ([Choices], [Weights]) tuples.
-        # This prevents creating lists inside the real-time loop.
+    def __init__(self, debug=False, seed=None):
+        # debug_info is only formatted when asked for; the f-string is not free
+        self.debug = debug
+
+        # Private generators: no contention on the shared module-level RNG from other threads,
+        # and a seed makes a performance reproducible.
+        self._rng = random.Random(seed)
+        self._rand = self._rng.random  # bound once for the hot path
+        self._np_rng = np.random.default_rng(seed)
+
+        # We pre-split data into ([Choices], [CumulativeWeights]) tuples.
+        # This prevents creating lists inside the real-time loop and lets us
+        # sample with a single random() + bisect instead of random.choices.
 
         # --- Table 1: Density ---
-        # Flattened Map: (Bar, DrumType) -> ([DensityLevels], [Weights])
+        # Flattened Map: (Bar, DrumType) -> ([DensityLevels], [CumWeights])
         self._density_map = {}
 
         # Helper to register range logic once at startup
         def register_density(bar_start, bar_end, drum, dist):
             choices = tuple(dist.keys())
-            weights = tuple(dist.values())
+            cum_weights = _cumulative(dist.values())
             for b in range(bar_start, bar_end + 1):
-                self._density_map[(b, drum)] = (choices, weights)
+                self._density_map[(b, drum)] = (choices, cum_weights)
 
         # Bar 1-3
         register_density(1, 3, DrumType.KICK,
@@ -34,11 +97,11 @@ class BayesianMusicGenerator:
                          {DensityLevel.SPARSE: 0.05, DensityLevel.MEDIUM: 0.25, DensityLevel.BUSY: 0.70})
 
         # --- Table 2: Energy ---
-        # Map: (VelCategory (0=Soft, 1=Loud), Density) -> ([EnergyLevels], [Weights])
+        # Map: (VelCategory (0=Soft, 1=Loud), Density) -> ([EnergyLevels], [CumWeights])
         self._energy_map = {}
 
         def register_energy(is_loud, density, dist):
-            self._energy_map[(1 if is_loud else 0, density)] = (tuple(dist.keys()), tuple(dist.values()))
+            self._energy_map[(1 if is_loud else 0, density)] = (tuple(dist.keys()), _cumulative(dist.values()))
 
         register_energy(False, DensityLevel.SPARSE,
                         {EnergyLevel.CHILL: 0.95, EnergyLevel.GROOVE: 0.05, EnergyLevel.HIGH: 0.0})
@@ -52,90 +115,110 @@ class BayesianMusicGenerator:
                         {EnergyLevel.CHILL: 0.00, EnergyLevel.GROOVE: 0.10, EnergyLevel.HIGH: 0.90})
 
         # --- Table 3: Chords ---
-        # Map: Bar -> ([ChordTypes], [Weights])
+        # Map: Bar -> ([ChordTypes], [CumWeights])
         self._chord_map = {
-            1: ((ChordType.I, ChordType.V), (0.95, 0.05)),
-            2: ((ChordType.I, ChordType.IV, ChordType.V, ChordType.VI), (0.10, 0.80, 0.05, 0.05)),
-            3: ((ChordType.I, ChordType.IV, ChordType.V), (0.90, 0.05, 0.05)),
-            4: ((ChordType.I, ChordType.IV, ChordType.V, ChordType.VI), (0.05, 0.05, 0.85, 0.05)),
+            1: ((ChordType.I, ChordType.V), _cumulative((0.95, 0.05))),
+            2: ((ChordType.I, ChordType.IV, ChordType.V, ChordType.VI), _cumulative((0.10, 0.80, 0.05, 0.05))),
+            3: ((ChordType.I, ChordType.IV, ChordType.V), _cumulative((0.90, 0.05, 0.05))),
+            4: ((ChordType.I, ChordType.IV, ChordType.V, ChordType.VI), _cumulative((0.05, 0.05, 0.85, 0.05))),
         }
 
+        # --- Table 4: Play Gate ---
+        # Nested tuple: [DrumType][BeatType][DensityLevel] -> P(Play)
+        def play_prob(drum, beat, density):
+            if drum == DrumType.KICK and beat == BeatType.DOWNBEAT:
+                return 0.99
+            if drum == DrumType.NONE:
+                return 0.0
+            return 0.2 if density == DensityLevel.SPARSE else 0.8
+
+        self._play_probs = tuple(tuple(tuple(play_prob(d, b, dens) for dens in DensityLevel)
+                                       for b in BeatType)
+                                 for d in DrumType)
+
         # --- Table 5: Pitch Function ---
-        # Map: (Chord, BeatType) -> ([PitchFuncs], [Weights])
+        # Map: (Chord, BeatType) -> ([PitchFuncs], [CumWeights])
         self._pitch_map = {}
 
         # Default distribution to fallback on
-        self._pitch_fallback = ((PitchFunc.ROOT, PitchFunc.THIRD_FIFTH, PitchFunc.COLOR), (0.30, 0.40, 0.30))
+        self._pitch_fallback = ((PitchFunc.ROOT, PitchFunc.THIRD_FIFTH, PitchFunc.COLOR), _cumulative((0.30, 0.40, 0.30)))
 
         # Specific overrides
         self._pitch_map[(ChordType.I, BeatType.DOWNBEAT)] = ((PitchFunc.ROOT, PitchFunc.THIRD_FIFTH, PitchFunc.COLOR),
-                                                             (0.80, 0.15, 0.05))
+                                                             _cumulative((0.80, 0.15, 0.05)))
         self._pitch_map[(ChordType.I, BeatType.OFFBEAT)] = ((PitchFunc.ROOT, PitchFunc.THIRD_FIFTH, PitchFunc.COLOR),
-                                                            (0.20, 0.60, 0.20))
+                                                            _cumulative((0.20, 0.60, 0.20)))
         self._pitch_map[(ChordType.V, BeatType.DOWNBEAT)] = ((PitchFunc.ROOT, PitchFunc.THIRD_FIFTH, PitchFunc.COLOR),
-                                                             (0.50, 0.30,
-                                                              0.20))  # Using 'Downbeat' to proxy 'Any' for now
+                                                             _cumulative((0.50, 0.30,
+                                                                          0.20)))  # Using 'Downbeat' to proxy 'Any' for now
+
+        # --- Dense Tables ---
+        # The same CPTs as above, expanded to cumulative rows over each variable's full
+        # domain so infer() can index them directly instead of hashing tuple keys.
+        # Bar index 0 holds the fallback row for bars outside 1-4.
+        self._density_rows = tuple(tuple(_dense_cum(*self._density_map.get((b, d), ((DensityLevel.MEDIUM,), (1.0,))),
+                                                    _DENSITIES)
+                                         for d in DrumType) for b in range(5))
+        self._energy_rows = tuple(tuple(_dense_cum(*self._energy_map.get((v, d), ((EnergyLevel.CHILL,), (1.0,))),
+                                                   _ENERGIES)
+                                        for d in DensityLevel) for v in range(2))
+        self._chord_rows = tuple(_dense_cum(*self._chord_map.get(b, ((ChordType.I,), (1.0,))), _CHORDS)
+                                 for b in range(5))
+        self._pitch_rows = tuple(tuple(_dense_cum(*self._pitch_map.get((c, bt), self._pitch_fallback), _PITCH_FUNCS)
+                                       for bt in BeatType) for c in _CHORDS)
+
+        # NumPy copies for infer_batch, which indexes them with whole columns of inputs at once
+        self._density_cum = np.array(self._density_rows)
+        self._energy_cum = np.array(self._energy_rows)
+        self._chord_cum = np.array(self._chord_rows)
+        self._pitch_cum = np.array(self._pitch_rows)
+        self._play_prob_array = np.array(self._play_probs)
+        self._root_offsets = np.array([CHORD_ROOT_OFFSETS[chord] for chord in _CHORDS])
 
     def infer(self, data: BayesianInput) -> BayesianOutput:
-        # --- PRE-CALCULATIONS ---
-        is_downbeat = (data.step % 4 == 1)  # 1, 5, 9, 13
-        is_offbeat = (data.step % 2 == 1) and not is_downbeat
+        rand = self._rand
 
-        if is_downbeat:
-            beat_type = BeatType.DOWNBEAT
-        elif is_offbeat:
-            beat_type = BeatType.OFFBEAT
-        else:
-            beat_type = BeatType.SUBDIVISION
+        # --- PRE-CALCULATIONS ---
+        beat_type = STEP_TO_BEAT[(data.step - 1) % 16]
+        is_loud = data.velocity > 90  # bool doubles as the 0/1 index into the energy table
 
-        is_loud = 1 if data.velocity > 90 else 0
+        bar = data.bar
+        if not 0 < bar < 5:
+            bar = 0  # fallback row
 
         # --- STEP 1: LATENT VARIABLES  ---
+        # Each draw is a bisect over a dense cumulative row; the result is the domain index.
 
         # 1. Density
-        d_choices, d_weights = self._density_map.get((data.bar, data.drum_type),
-                                                     ([DensityLevel.MEDIUM], [1.0]))
-        current_density = random.choices(d_choices, weights=d_weights)[0]
+        current_density = bisect(self._density_rows[bar][data.drum_type], rand())
 
         # 2. Energy
-        e_key = (is_loud, current_density)
-        e_choices, e_weights = self._energy_map.get(e_key, ([EnergyLevel.CHILL], [1.0]))
-        current_energy = random.choices(e_choices, weights=e_weights)[0]
+        current_energy = bisect(self._energy_rows[is_loud][current_density], rand())
 
         # 3. Chord
-        c_choices, c_weights = self._chord_map.get(data.bar, ([ChordType.I], [1.0]))
-        current_chord = random.choices(c_choices, weights=c_weights)[0]
+        chord_idx = bisect(self._chord_rows[bar], rand())
+        current_chord = _CHORDS[chord_idx]
 
         # --- STEP 2: OUTPUT VARIABLES ---
 
         # 4. Play Gate
-        if data.drum_type == DrumType.KICK and is_downbeat:
-            should_play = (random.random() < 0.99)
-        elif data.drum_type == DrumType.NONE:
-            should_play = False
-        else:
-            base_prob = 0.2 if current_density == DensityLevel.SPARSE else 0.8
-            should_play = (random.random() < base_prob)
+        should_play = rand() < self._play_probs[data.drum_type][beat_type][current_density]
 
         if not should_play:
             # Quick exit
-            return BayesianOutput(False, 0, 0, 0, 0, "Rest")
+            return _REST_OUTPUT
 
         # 5. Pitch Function
-        p_key = (current_chord, beat_type)
-        p_choices, p_weights = self._pitch_map.get(p_key, self._pitch_fallback)
-        pitch_func = random.choices(p_choices, weights=p_weights)[0]
-
-        # 6. Resolve Pitch
-        final_pitch = self._resolve_pitch(current_chord, pitch_func)
+        pitch_func = _PITCH_FUNCS[bisect(self._pitch_rows[chord_idx][beat_type], rand())]
 
-        # 7. Velocity & Channel
+        # 6. Channel & Pitch
         final_channel = 1 if data.drum_type == DrumType.KICK else 2
+        final_pitch = self._resolve_pitch(current_chord, pitch_func, final_channel)
 
-        # optimized velocity math
-        energy_mult = 1.2 if current_energy == EnergyLevel.HIGH else 0.9
-        final_velocity = int(data.velocity * energy_mult)
-        if final_velocity > 127: final_velocity = 127
+        # 7. Velocity
+
+        # optimized velocity math (precomputed per energy level)
+        final_velocity = VELOCITY_TABLE[current_energy][data.velocity]
 
         return BayesianOutput(
             should_play=True,
@@ -143,31 +226,49 @@ class BayesianMusicGenerator:
             velocity=final_velocity,
             duration=0.5,
             channel=final_channel,
-            debug_info=f"{current_chord.name} -> {pitch_func.name}"
+            debug_info=f"{current_chord.name} -> {pitch_func.name}" if self.debug else ""
         )
 
-    def _resolve_pitch(self, chord: ChordType, func: PitchFunc) -> int:
-        # Offsets relative to C (60)
-        # Using if/elif is faster than dictionary creation inside the method
-        root_offset = 0
-        if chord == ChordType.IV:
-            root_offset = 5
-        elif chord == ChordType.V:
-            root_offset = 7
-        elif chord == ChordType.VI:
-            root_offset = 9
-
-        interval = 0
-        if func == PitchFunc.THIRD_FIFTH:
-            interval = 4 if random.random() < 0.5 else 7
-        elif func == PitchFunc.COLOR:
-            # simple random choice
-            r = random.random()
-            if r < 0.33:
-                interval = 2
-            elif r < 0.66:
-                interval = 11
-            else:
-                interval = 14
-
-        return 60 + root_offset + interval
\ No newline at end of file
+    def infer_batch(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of infer() for offline use and benchmarking.
+        Takes an (N, 4) int array of (drum_type, velocity, bar, step) rows and returns an
+        (N, 4) int array of (should_play, midi_note, velocity, channel). Rests are all zeros.
+        """
+        drums, velocities, bars, steps = inputs.T
+        n = len(inputs)
+        uniform = self._np_rng.random
+
+        # --- PRE-CALCULATIONS ---
+        beat_types = _STEP_BEAT_ARRAY[(steps - 1) % 16]
+        is_loud = (velocities > 90).astype(np.intp)
+        bar_idx = np.where((bars >= 1) & (bars <= 4), bars, 0)
+
+        # Counting cum entries <= r is bisect() over every row at once
+        def sample(cum_rows):
+            return (uniform((n, 1)) >= cum_rows).sum(axis=1)
+
+        # --- STEP 1: LATENT VARIABLES ---
+        density = sample(self._density_cum[bar_idx, drums])
+        energy = sample(self._energy_cum[is_loud, density])
+        chord_idx = sample(self._chord_cum[bar_idx])
+
+        # --- STEP 2: OUTPUT VARIABLES ---
+        should_play = uniform(n) < self._play_prob_array[drums, beat_types, density]
+
+        pitch_func = sample(self._pitch_cum[chord_idx, beat_types])
+
+        interval = _INTERVAL_ARRAY[pitch_func, sample(_INTERVAL_CUM[pitch_func])]
+        notes = 60 + self._root_offsets[chord_idx] + interval
+
+        channels = np.where(drums == DrumType.KICK, 1, 2)
+        out_velocities = _VELOCITY_ARRAY[energy, velocities]
+
+        out = np.stack([should_play, notes, out_velocities, channels], axis=1).astype(np.intp)
+        out[~should_play] = 0
+        return out
+
+    def _resolve_pitch(self, chord: ChordType, func: PitchFunc, channel: int) -> int:
+        # Root offset and interval weights come from the shared helpers table
+        notes, cum_weights = _PITCH_TABLE[(chord, func, channel)]
+        return notes[bisect(cum_weights, self._rand())]
@@ -1,19 +1,46 @@
 import pyagrum as gum
 import random
+from bisect import bisect
 from bayesian.bayesian_network_helpers import *
 
 # Assumes you have your Enums/Dataclasses imported:
 # from my_music_types import DrumType, DensityLevel, EnergyLevel, ChordType, BeatType, PitchFunc, BayesianInput, BayesianOutput
 
+# Channel Transposition
+# Channel 1 (Bass) -> Down 1 octave (-12)
+# Channel 3 (Lead) -> Up 1 octave (+12)
+_PITCH_TABLE = build_pitch_table({1: -12, 2: 0, 3: 12})
+
+# Sampled state index -> enum member, built once instead of per infer() call
+_PITCH_FUNCS = tuple(PitchFunc)
+_CHORDS = (ChordType.I, ChordType.IV, ChordType.V, ChordType.VI)
+
+
+# Inlined categorical samplers for the tiny posteriors (already normalised by pyAgrum).
+# One random() and a compare chain; random.choices would rebuild cumulative weights per call.
+def _sample3(p):
+    x = random.random()
+    if x < p[0]: return 0
+    if x < p[0] + p[1]: return 1
+    return 2
+
+
+def _sample4(p):
+    x = random.random()
+    c = p[0]
+    if x < c: return 0
+    c += p[1]
+    if x < c: return 1
+    if x < c + p[2]: return 2
+    return 3
+
+
 class BayesianMusicGeneratorAg:
     def __init__(self):
         # 1. Build Network
         self.bn = self._build_network()
 
-        # 2. Optimization: Use Variable Elimination (Faster for small queries)
-        self.ie = gum.VariableElimination(self.bn)
-
-        # 3. Optimization: Cache Node IDs (Avoids string lookup overhead)
+        # 2. Optimization: Cache Node IDs (Avoids string lookup overhead)
         self.id_bar = self.bn.idFromName('Bar')
         self.id_drum = self.bn.idFromName('Drum_Type')
         self.id_vel = self.bn.idFromName('In_Velocity')
@@ -27,6 +54,36 @@ class BayesianMusicGeneratorAg:
         self.id_pitch = self.bn.idFromName('Pitch_Func')
         self.id_channel = self.bn.idFromName('Out_Channel')  # <--- Added Back
 
+        # 3. Optimization: Precompute every posterior once
+        # The evidence set {Bar, Drum_Type, In_Velocity, Beat_Type} only has
+        # 4 * 4 * 2 * 3 = 96 configurations, so infer() never has to run inference.
+        # (Bar index 0-3, Drum, Vel index 0/1, Beat) -> (Play, PitchFunc, Chord, Energy, Channel)
+        self.posteriors = self._precompute_posteriors(gum.LazyPropagation(self.bn))
+
+    def _precompute_posteriors(self, ie) -> dict:
+        """
+        Queries every evidence configuration and keeps the results as plain lists.
+        LazyPropagation builds its junction tree once; chgEvidence() then only
+        invalidates the messages that depend on the evidence that actually changed.
+        """
+        outputs = (self.id_play, self.id_pitch, self.id_chord, self.id_energy, self.id_channel)
+        evidence = (self.id_bar, self.id_drum, self.id_vel, self.id_beat)
+        for node in evidence:
+            ie.addEvidence(node, 0)
+
+        table = {}
+        # Plain ints throughout (IntEnum members hash equal, so infer() can look up with either)
+        for bar_idx in range(4):
+            ie.chgEvidence(self.id_bar, bar_idx)
+            for drum in range(len(DrumType)):
+                ie.chgEvidence(self.id_drum, drum)
+                for vel_idx in (0, 1):
+                    ie.chgEvidence(self.id_vel, vel_idx)
+                    for beat in range(len(BeatType)):
+                        ie.chgEvidence(self.id_beat, beat)
+                        table[(bar_idx, drum, vel_idx, beat)] = tuple(ie.posterior(node).tolist() for node in outputs)
+        return table
+
     def _build_network(self):
         bn = gum.BayesNet("DrumGenie_Final")
 
@@ -58,123 +115,23 @@ class BayesianMusicGeneratorAg:
             bn.addArc(*link)
 
         # --- FILL CPTs ---
-
-        # 1. DENSITY (48 cells)
-        bn.cpt(density).fillWith([0.33, 0.33, 0.34] * 16)
-
-        def set_density(b_start, b_end, d_enum, dist):
-            arr = [dist.get(DensityLevel.SPARSE, 0), dist.get(DensityLevel.MEDIUM, 0), dist.get(DensityLevel.BUSY, 0)]
-            for b in range(b_start, b_end + 1):
-                bn.cpt(density)[{'Bar': b - 1, 'Drum_Type': int(d_enum)}] = arr
-
-        set_density(1, 3, DrumType.KICK,
-                    {DensityLevel.SPARSE: 0.80, DensityLevel.MEDIUM: 0.15, DensityLevel.BUSY: 0.05})
-        set_density(1, 3, DrumType.SNARE,
-                    {DensityLevel.SPARSE: 0.20, DensityLevel.MEDIUM: 0.70, DensityLevel.BUSY: 0.10})
-        set_density(1, 3, DrumType.RIM, {DensityLevel.SPARSE: 0.10, DensityLevel.MEDIUM: 0.40, DensityLevel.BUSY: 0.50})
-        set_density(4, 4, DrumType.KICK,
-                    {DensityLevel.SPARSE: 0.40, DensityLevel.MEDIUM: 0.40, DensityLevel.BUSY: 0.20})
-        set_density(4, 4, DrumType.SNARE,
-                    {DensityLevel.SPARSE: 0.05, DensityLevel.MEDIUM: 0.25, DensityLevel.BUSY: 0.70})
-        set_density(4, 4, DrumType.RIM, {DensityLevel.SPARSE: 0.05, DensityLevel.MEDIUM: 0.25, DensityLevel.BUSY: 0.70})
-
-        # 2. ENERGY (18 cells)
-        bn.cpt(energy).fillWith([0.33, 0.33, 0.34] * 6)
-
-        def set_energy(is_loud, dens_enum, dist):
-            arr = [dist.get(EnergyLevel.CHILL, 0), dist.get(EnergyLevel.GROOVE, 0), dist.get(EnergyLevel.HIGH, 0)]
-            bn.cpt(energy)[{'In_Velocity': 1 if is_loud else 0, 'Density': int(dens_enum)}] = arr
-
-        set_energy(False, DensityLevel.SPARSE, {EnergyLevel.CHILL: 0.95, EnergyLevel.GROOVE: 0.05})
-        set_energy(False, DensityLevel.BUSY, {EnergyLevel.CHILL: 0.60, EnergyLevel.GROOVE: 0.40})
-        set_energy(False, DensityLevel.MEDIUM, {EnergyLevel.CHILL: 0.80, EnergyLevel.GROOVE: 0.20})
-        set_energy(True, DensityLevel.SPARSE,
-                   {EnergyLevel.CHILL: 0.20, EnergyLevel.GROOVE: 0.70, EnergyLevel.HIGH: 0.10})
-        set_energy(True, DensityLevel.MEDIUM,
-                   {EnergyLevel.CHILL: 0.05, EnergyLevel.GROOVE: 0.50, EnergyLevel.HIGH: 0.45})
-        set_energy(True, DensityLevel.BUSY, {EnergyLevel.CHILL: 0.00, EnergyLevel.GROOVE: 0.10, EnergyLevel.HIGH: 0.90})
-
-        # 3. CHORD (4 rows * 4 values = 16 cells)
-        bn.cpt(chord).fillWith([0.25, 0.25, 0.25, 0.25] * 4)
-
-        def set_chord(bar_num, dist):
-            arr = [dist.get(ChordType.I, 0), dist.get(ChordType.IV, 0), dist.get(ChordType.V, 0),
-                   dist.get(ChordType.VI, 0)]
-            bn.cpt(chord)[{'Bar': bar_num - 1}] = arr
-
-        set_chord(1, {ChordType.I: 0.95, ChordType.V: 0.05})
-        set_chord(2, {ChordType.I: 0.10, ChordType.IV: 0.80, ChordType.V: 0.05, ChordType.VI: 0.05})
-        set_chord(3, {ChordType.I: 0.90, ChordType.IV: 0.05, ChordType.V: 0.05})
-        set_chord(4, {ChordType.I: 0.05, ChordType.IV: 0.05, ChordType.V: 0.85, ChordType.VI: 0.05})
-
-        # 4. PLAY GATE
-        # We use the loop logic here as it's cleaner than fillWith for complex conditionals
-        for d_type in [DrumType.NONE, DrumType.KICK, DrumType.SNARE, DrumType.RIM]:
-            for b_type in [BeatType.DOWNBEAT, BeatType.OFFBEAT, BeatType.SUBDIVISION]:
-                for dens in [DensityLevel.SPARSE, DensityLevel.MEDIUM, DensityLevel.BUSY]:
-                    p_play = 0.0
-                    if d_type == DrumType.NONE:
-                        p_play = 0.0
-                    elif d_type == DrumType.KICK and b_type == BeatType.DOWNBEAT:
-                        p_play = 0.99
-                    else:
-                        p_play = 0.2 if dens == DensityLevel.SPARSE else 0.8
-                    bn.cpt(play)[{'Drum_Type': int(d_type), 'Beat_Type': int(b_type), 'Density': int(dens)}] = [
-                        1.0 - p_play, p_play]
-
-        # 5. PITCH FUNC (36 cells)
-        bn.cpt(pitch_func).fillWith([0.30, 0.40, 0.30] * 12)
-        c_map = {ChordType.I: 0, ChordType.IV: 1, ChordType.V: 2, ChordType.VI: 3}
-        bn.cpt(pitch_func)[{'Chord': c_map[ChordType.I], 'Beat_Type': int(BeatType.DOWNBEAT)}] = [0.80, 0.15, 0.05]
-        bn.cpt(pitch_func)[{'Chord': c_map[ChordType.I], 'Beat_Type': int(BeatType.OFFBEAT)}] = [0.20, 0.60, 0.20]
-        bn.cpt(pitch_func)[{'Chord': c_map[ChordType.V], 'Beat_Type': int(BeatType.DOWNBEAT)}] = [0.50, 0.30, 0.20]
-
-        # 6. OUTPUT CHANNEL (NEW)
-        # Size: 4(Drum) * 4(Bar) * 3(Channel) = 48 cells
-        bn.cpt(channel).fillWith([1, 0, 0] * 16)  # Initialize Default to Ch1
-
-        # Kick (1) -> Always Ch1 (Bass)
-        # Rim (3) -> Always Ch3 (Lead)
-        # None (0) -> Don't care
-        for b in range(4):
-            bn.cpt(channel)[{'Bar': b, 'Drum_Type': int(DrumType.KICK)}] = [1.0, 0.0, 0.0]
-            bn.cpt(channel)[{'Bar': b, 'Drum_Type': int(DrumType.RIM)}] = [0.0, 0.0, 1.0]
-
-        # Snare (2) Logic
-        # Bar 1-3 (Indices 0, 1, 2)
-        for b in [0, 1, 2]:
-            bn.cpt(channel)[{'Bar': b, 'Drum_Type': int(DrumType.SNARE)}] = [0.0, 0.90, 0.10]  # Mostly Ch2
-
-        # Bar 4 (Index 3)
-        bn.cpt(channel)[{'Bar': 3, 'Drum_Type': int(DrumType.SNARE)}] = [0.0, 0.40, 0.60]  # More Ch3
+        # Each table is one NumPy array (see build_cpt_arrays) written with a single fillWith()
+        for name, table in build_cpt_arrays().items():
+            bn.cpt(name).fillWith(table.ravel().tolist())
 
         return bn
 
     def infer(self, data: BayesianInput) -> BayesianOutput:
         # --- Pre-calc Context ---
-        is_downbeat = (data.step % 4 == 1)
-        is_offbeat = (data.step % 2 == 1) and not is_downbeat
-
-        if is_downbeat:
-            b_enum = BeatType.DOWNBEAT
-        elif is_offbeat:
-            b_enum = BeatType.OFFBEAT
-        else:
-            b_enum = BeatType.SUBDIVISION
+        b_enum = STEP_TO_BEAT[(data.step - 1) % 16]
 
         vel_idx = 1 if data.velocity > 90 else 0
 
-        # --- Set Evidence (Using Cached IDs) ---
-        self.ie.setEvidence({
-            self.id_bar: data.bar - 1,
-            self.id_drum: int(data.drum_type),
-            self.id_vel: vel_idx,
-            self.id_beat: int(b_enum)
-        })
+        # --- Look up the precomputed posteriors ---
+        play_dist, pf_dist, c_dist, e_dist, chan_dist = self.posteriors[(data.bar - 1, data.drum_type, vel_idx, b_enum)]
 
         # --- 1. Gate Check (Optimization) ---
-        play_dist = self.ie.posterior(self.id_play).tolist()
-        should_play = random.choices([False, True], weights=play_dist)[0]
+        should_play = random.random() >= play_dist[0]
 
         if not should_play:
             return BayesianOutput(False, 0, 0, 0, 0, "Rest")
@@ -182,27 +139,20 @@ class BayesianMusicGeneratorAg:
         # --- 2. Sample Latent & Output Nodes ---
 
         # CHANNEL
-        chan_dist = self.ie.posterior(self.id_channel).tolist()
-        channel_idx = random.choices([0, 1, 2], weights=chan_dist)[0]
+        channel_idx = _sample3(chan_dist)
         final_channel = channel_idx + 1  # Convert 0-2 to MIDI 1-3
 
         # PITCH FUNC
-        pf_dist = self.ie.posterior(self.id_pitch).tolist()
-        pf_val = random.choices(list(PitchFunc), weights=pf_dist)[0]
+        pf_val = _PITCH_FUNCS[_sample3(pf_dist)]
 
         # CHORD (Needed for Pitch Math)
-        c_dist = self.ie.posterior(self.id_chord).tolist()
-        c_enums = [ChordType.I, ChordType.IV, ChordType.V, ChordType.VI]
-        current_chord = random.choices(c_enums, weights=c_dist)[0]
+        current_chord = _CHORDS[_sample4(c_dist)]
 
         # ENERGY (Needed for Velocity Math)
-        e_dist = self.ie.posterior(self.id_energy).tolist()
-        current_energy = random.choices(list(EnergyLevel), weights=e_dist)[0]
+        energy_idx = _sample3(e_dist)
 
         # --- 3. Post-Processing ---
-        energy_mult = 1.2 if current_energy == EnergyLevel.HIGH else 0.9
-        final_velocity = int(data.velocity * energy_mult)
-        if final_velocity > 127: final_velocity = 127
+        final_velocity = VELOCITY_TABLE[energy_idx][data.velocity]
 
         final_pitch = self._resolve_pitch(current_chord, pf_val, final_channel)
 
@@ -216,38 +166,7 @@ class BayesianMusicGeneratorAg:
         )
 
     def _resolve_pitch(self, chord: ChordType, func: PitchFunc, channel: int) -> int:
-
-        # 1. Determine Root Offset based on Chord
-        root_offset = 0
-        if chord == ChordType.IV:
-            root_offset = 5
-        elif chord == ChordType.V:
-            root_offset = 7
-        elif chord == ChordType.VI:
-            root_offset = 9
-
-        # 2. Determine Interval based on Pitch Function
-        interval = 0
-        if func == PitchFunc.THIRD_FIFTH:
-            interval = 4 if random.random() < 0.5 else 7
-        elif func == PitchFunc.COLOR:
-            r = random.random()
-            if r < 0.33:
-                interval = 2
-            elif r < 0.66:
-                interval = 11
-            else:
-                interval = 14
-
-        # 3. Calculate Base Pitch (Middle C approx)
-        base_pitch = 60 + root_offset + interval
-
-        # 4. Apply Channel Transposition
-        # Channel 1 (Bass) -> Down 1 octave (-12)
-        # Channel 3 (Lead) -> Up 1 octave (+12)
-        if channel == 1:
-            base_pitch -= 12
-        elif channel == 3:
-            base_pitch += 12
-
-        return base_pitch
\ No newline at end of file
+        # Root offset, interval choice and channel transposition are baked into
+        # _PITCH_TABLE, so only the interval draw is left per call
+        notes, cum_weights = _PITCH_TABLE[(chord, func, channel)]
+        return notes[bisect(cum_weights, random.random())]
\ No newline at end of file
@@ -1,140 +1,264 @@
-import random
-import pyagrum as gum
+import os
+import hashlib
+import zipfile
+import numpy as np
 
-from bayesian.bayesian_network_ag import BayesianMusicGeneratorAg
 from bayesian.bayesian_network_helpers import *
 
 # Assumes Enums and Dataclasses are imported
 # from my_music_types import DrumType, DensityLevel, EnergyLevel, ChordType, BeatType, PitchFunc, BayesianInput, BayesianOutput
 
+# Flat table layout: one row per (Bar, Drum, IsLoud, Step) key, see _key_index()
+NUM_KEYS = 4 * 4 * 2 * 16
+
+# Second axis of the table: one padded row of probabilities per sampled node
+ROW_PLAY, ROW_PITCH, ROW_CHORD, ROW_ENERGY, ROW_CHANNEL = range(5)
+
+# The baked table is cached next to this module so later starts skip pyAgrum entirely.
+# The cache stores a hash of the network's CPTs and is rebaked whenever they change.
+BAKE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "drumgenie_bake.npz")
+
+
+def _cpt_hash() -> str:
+    """Fingerprints the network's CPT arrays (names, shapes and values)."""
+    digest = hashlib.sha1()
+    for name, table in build_cpt_arrays().items():
+        table = np.ascontiguousarray(table, dtype=np.float64)
+        digest.update(f"{name}{table.shape}".encode())
+        digest.update(table.tobytes())
+    return digest.hexdigest()
+
+# Number of pre-drawn samples kept per key before its bank is redrawn
+SAMPLE_BANK = 1024
+
+# Channel Transposition
+# Channel 1 (Bass) -> Down 2 octaves (-24)
+# Channel 2 (Mid) -> Down 1 octave (-12)
+# Channel 3 (Lead) -> Up 2 octaves (+24)
+_PITCH_TABLE = build_pitch_table({1: -24, 2: -12, 3: 24})
+
+_CHORDS = (ChordType.I, ChordType.IV, ChordType.V, ChordType.VI)
+
+
+def _build_outcomes():
+    """
+    Enumerates every playable result as (note, is_high_energy, channel, debug_info),
+    together with the (pitch func, chord, is_high, channel) state indices and the
+    interval weight it is drawn from. Outcome 0 is reserved for Rest.
+    """
+    outcomes = [None]
+    states = [(0, 0, 0, 0, 0.0)]
+    for pf in PitchFunc:
+        for c_idx, chord in enumerate(_CHORDS):
+            for is_high in (False, True):
+                for ch_idx in range(3):
+                    notes, cum_weights = _PITCH_TABLE[(chord, pf, ch_idx + 1)]
+                    prev = 0.0
+                    for note, cum in zip(notes, cum_weights):
+                        outcomes.append((note, is_high, ch_idx + 1, f"{chord.name} -> {pf.name} (Baked)"))
+                        states.append((int(pf), c_idx, int(is_high), ch_idx, cum - prev))
+                        prev = cum
+    return tuple(outcomes), np.array(states).T
+
+
+# Fused outcome space: 144 playable results + Rest, so sample ids fit in a uint8
+_OUTCOMES, _OUTCOME_STATES = _build_outcomes()
+
+# is_high -> velocity row; CHILL and GROOVE share the same multiplier
+_VELOCITY_ROWS = (VELOCITY_TABLE[EnergyLevel.CHILL], VELOCITY_TABLE[EnergyLevel.HIGH])
+_VELOCITY_ARRAY = np.array(_VELOCITY_ROWS, dtype=np.intp)
+
+# Column views of _OUTCOMES for infer_batch(); the Rest slot decodes to zeros
+_OUTCOME_NOTES = np.array([0] + [o[0] for o in _OUTCOMES[1:]], dtype=np.intp)
+_OUTCOME_HIGH = np.array([False] + [o[1] for o in _OUTCOMES[1:]])
+_OUTCOME_CHANNELS = np.array([0] + [o[2] for o in _OUTCOMES[1:]], dtype=np.intp)
+
+# Shared results for the two rest paths (BayesianOutput is frozen)
+_REST_BAKED = BayesianOutput(False, 0, 0, 0, 0, "Rest (Baked)")
+_REST = BayesianOutput(False, 0, 0, 0, 0, "Rest")
+
+
+def _key_index(bar, drum, is_loud, step):
+    """Packs a (Bar 1-4, Drum 0-3, IsLoud 0/1, Step 1-16) key into a flat row index."""
+    return (((bar - 1) * 4 + drum) * 2 + is_loud) * 16 + (step - 1)
+
+
 class BakedBayesianGenerator:
     def __init__(self):
         print("Initializing Logic Engine...")
-        print("  - Building Bayesian Network...")
-        # We rely on the PyAgrum class just for the baking phase
-        # (Assuming the class from the previous step is named BayesianMusicGeneratorAg)
-        self._engine = BayesianMusicGeneratorAg()
-
-        print(f"  - Baking 512 states into lookup table...", end="")
-        self._lookup_table = {}
-        self._bake_logic()
-        print(" Done.")
-
-        # We can now delete the heavy engine to free memory
-        del self._engine
+        if not self._load_cache():
+            print("  - Building Bayesian Network...")
+            # We rely on the PyAgrum class just for the baking phase
+            # (imported here so a cached start never loads pyAgrum)
+            from bayesian.bayesian_network_ag import BayesianMusicGeneratorAg
+            self._engine = BayesianMusicGeneratorAg()
+
+            print(f"  - Baking {NUM_KEYS} states into lookup table...", end="")
+            # [key, node, state] -> probability; nodes with fewer than 4 states are zero-padded
+            self._flat = np.zeros((NUM_KEYS, 5, 4), dtype=np.float32)
+            # [key] -> True when P(Play) is effectively 0, so infer() can skip sampling
+            self._rest = np.zeros(NUM_KEYS, dtype=bool)
+            self._bake_logic()
+            print(" Done.")
+
+            # We can now delete the heavy engine to free memory
+            del self._engine
+            self._save_cache()
+
+        # [key, outcome] -> cumulative probability of each fused outcome, normalised
+        # once here so refills only binary-search it (rest keys stay all zero).
+        # Accumulated in float64, stored as float32: the CPTs only have 2 decimals.
+        cum = np.cumsum(self._fuse(), axis=1)
+        totals = cum[:, -1:]
+        cum = (cum / np.where(totals > 0, totals, 1.0)).astype(np.float32)
+
+        # Deduplicate: step only matters through its beat class, so the 512 keys share
+        # fewer than 100 distinct distributions. [slot, outcome] -> cumulative probability,
+        # [key] -> slot. Keys in the same slot also share one sample bank.
+        self._palette, slots = np.unique(cum, axis=0, return_inverse=True)
+        self._slot = slots.reshape(-1).astype(np.uint16)
+        num_slots = len(self._palette)
+
+        # Pre-draw a bank of outcome ids per slot so infer() only reads indices
+        # [slot, n] -> sampled outcome id; cursor[slot] -> next unread sample
+        self._rng = np.random.default_rng()
+        self._samples = np.zeros((num_slots, SAMPLE_BANK), dtype=np.uint8)
+        self._cursor = [0] * num_slots
+        for slot in np.unique(self._slot[~self._rest]).tolist():
+            self._refill(slot)
+
+        # infer() reads plain Python ints: indexing bytes / a memoryview / a list avoids
+        # boxing a NumPy scalar per access.
+        # _bank_bytes is a flat view of _samples, so refills show up in it directly.
+        self._rest_flags = self._rest.tobytes()
+        self._slot_ids = self._slot.tolist()
+        self._bank_bytes = memoryview(self._samples).cast('B')
+
+    def _load_cache(self) -> bool:
+        """Loads the baked (_flat, _rest) tables from BAKE_CACHE. Returns False if there is no usable cache."""
+        try:
+            with np.load(BAKE_CACHE, allow_pickle=False) as cache:
+                if str(cache["cpt_hash"]) != _cpt_hash():
+                    return False
+                flat, rest = cache["flat"], cache["rest"]
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return False
+        if flat.shape != (NUM_KEYS, 5, 4) or flat.dtype != np.float32:
+            return False
+        if rest.shape != (NUM_KEYS,) or rest.dtype != np.bool_:
+            return False
+        self._flat, self._rest = flat, rest
+        print(f"  - Loaded baked lookup table from {os.path.basename(BAKE_CACHE)}")
+        return True
+
+    def _save_cache(self):
+        """Writes the baked tables to BAKE_CACHE. A read-only install just bakes again next start."""
+        try:
+            np.savez(BAKE_CACHE, flat=self._flat, rest=self._rest, cpt_hash=np.array(_cpt_hash()))
+        except OSError:
+            pass
 
     def _bake_logic(self):
         """
-        Iterates every possible input combination, runs the Bayesian inference,
-        and saves the resulting probability distributions.
+        Iterates every possible input combination, looks up the engine's
+        precomputed posteriors, and saves the resulting probability distributions.
         """
+        # Step only enters the network through Beat_Type, so the 16 steps collapse
+        # to 3 beat classes: 96 distinct posteriors, each fanned out to its steps
+        steps_by_beat = [[step for step in range(1, 17) if STEP_TO_BEAT[step - 1] == beat] for beat in BeatType]
+
         # Iterate all Dimensions
         for bar in range(1, 5):
-            for drum in [DrumType.NONE, DrumType.KICK, DrumType.SNARE, DrumType.RIM]:
+            for drum in range(len(DrumType)):
                 # We iterate the categorical velocity (Soft/Loud), not 0-127
-                for is_loud in [False, True]:
-                    for step in range(1, 17):
-
-                        # 1. Setup Evidence in the Engine
-                        # We have to replicate the 'infer' setup logic here manually
-                        # to get the raw distributions out.
-
-                        # Context derivation
-                        is_downbeat = (step % 4 == 1)
-                        is_offbeat = (step % 2 == 1) and not is_downbeat
-                        if is_downbeat:
-                            b_enum = BeatType.DOWNBEAT
-                        elif is_offbeat:
-                            b_enum = BeatType.OFFBEAT
-                        else:
-                            b_enum = BeatType.SUBDIVISION
-
-                        # Convert Step to "Harmonic Context" logic if needed
-                        # (Your current model relies on Bar, not Step, for chords, so this is easy)
+                for is_loud in (0, 1):
+                    for beat, steps in enumerate(steps_by_beat):
 
-                        # Set Evidence directly
-                        # We use the string keys for safety/clarity during baking
-                        self._engine.ie.setEvidence({
-                            'Bar': bar - 1,
-                            'Drum_Type': int(drum),
-                            'In_Velocity': 1 if is_loud else 0,
-                            'Beat_Type': int(b_enum)
-                        })
+                        # 1. Extract Distributions (The "Baking")
+                        # The engine already holds the posteriors [P(0), P(1), ...] for
+                        # every evidence combination, so this is a plain lookup
+                        play_dist, pf_dist, c_dist, e_dist, chan_dist = \
+                            self._engine.posteriors[(bar - 1, drum, is_loud, beat)]
 
-                        # 2. Extract Distributions (The "Baking")
-                        # We grab the raw list of floats [P(0), P(1), ...] for each node
+                        # 2. Store in Table
+                        # Key: (Bar, DrumEnum, IsLoud, Step) packed into flat row indices
+                        idxs = [_key_index(bar, drum, is_loud, step) for step in steps]
 
                         # Optimization: Check Play Gate first.
-                        # If P(Play=True) is 0.0 (like for DrumType.NONE), we store None to save space.
-                        play_dist = self._engine.ie.posterior('Play_Note').tolist()
-
+                        # If P(Play=True) is 0.0 (like for DrumType.NONE), we flag the keys as rests.
                         if play_dist[1] < 0.001:  # P(Play) is effectively 0
-                            cache_entry = None
+                            self._rest[idxs] = True
                         else:
-                            cache_entry = {
-                                'play': play_dist,
-                                'pitch': self._engine.ie.posterior('Pitch_Func').tolist(),
-                                'chord': self._engine.ie.posterior('Chord').tolist(),
-                                'energy': self._engine.ie.posterior('Energy').tolist(),
-                                'channel': self._engine.ie.posterior('Out_Channel').tolist()
-                            }
-
-                        # 3. Store in Table
-                        # Key: (Bar, DrumEnum, IsLoud, Step)
-                        key = (bar, drum, is_loud, step)
-                        self._lookup_table[key] = cache_entry
-
-                        # Reset for next loop
-                        self._engine.ie.eraseAllEvidence()
+                            self._flat[idxs, ROW_PLAY, :2] = play_dist
+                            self._flat[idxs, ROW_PITCH, :3] = pf_dist
+                            self._flat[idxs, ROW_CHORD, :4] = c_dist
+                            self._flat[idxs, ROW_ENERGY, :3] = e_dist
+                            self._flat[idxs, ROW_CHANNEL, :3] = chan_dist
+
+    def _fuse(self):
+        """
+        Folds the five baked marginals of every key into a single categorical over
+        _OUTCOMES. Everything after sampling is deterministic, so one draw per note
+        replaces five (six with the pitch interval).
+        """
+        pf, chord, high, chan, interval_w = _OUTCOME_STATES
+        pf, chord, high, chan = (a.astype(np.intp) for a in (pf, chord, high, chan))
+        flat = self._flat.astype(np.float64)
+
+        # Energy only matters as HIGH vs not-HIGH (velocity multiplier)
+        p_high = flat[:, ROW_ENERGY, EnergyLevel.HIGH, None]
+        p_energy = np.where(high, p_high, 1.0 - p_high)
+
+        probs = (flat[:, ROW_PLAY, 1, None]
+                 * flat[:, ROW_PITCH, pf]
+                 * flat[:, ROW_CHORD, chord]
+                 * p_energy
+                 * flat[:, ROW_CHANNEL, chan]
+                 * interval_w)
+        probs[:, 0] = flat[:, ROW_PLAY, 0]
+        return probs
+
+    def _refill(self, slot):
+        """Draws a fresh bank of SAMPLE_BANK outcome ids for one palette slot."""
+        # Inverse CDF: index of the first cumulative weight above each uniform draw
+        self._samples[slot] = np.searchsorted(self._palette[slot], self._rng.random(SAMPLE_BANK), side='right')
+        self._cursor[slot] = 0
 
     def infer(self, data: BayesianInput) -> BayesianOutput:
         """
-        Real-time inference. Zero graph traversal. Pure dictionary lookup + random math.
+        Real-time inference. Zero graph traversal. Pure array lookup into pre-drawn samples.
         """
         # 1. Create Lookup Key
-        is_loud = data.velocity > 90
-        key = (data.bar, data.drum_type, is_loud, data.step)
+        bar = data.bar
+        step = data.step
+
+        # Keys outside the baked grid have no distributions (Rest)
+        if not (0 < bar < 5 and 0 < step < 17):
+            return _REST_BAKED
 
-        # 2. Retrieve Probabilities
-        dists = self._lookup_table.get(key)
+        idx = _key_index(bar, data.drum_type, data.velocity > 90, step)
 
         # Fast Fail (Rest)
-        if dists is None:
-            return BayesianOutput(False, 0, 0, 0, 0, "Rest (Baked)")
+        if self._rest_flags[idx]:
+            return _REST_BAKED
 
-        # 3. Sample from Distributions
-        # choices() is fast. It uses the weights we baked.
+        # 2. Take the next pre-drawn sample for this key's distribution
+        slot = self._slot_ids[idx]
+        if self._cursor[slot] == SAMPLE_BANK:
+            self._refill(slot)
+        i = self._cursor[slot]
+        self._cursor[slot] = i + 1
+        outcome = self._bank_bytes[slot * SAMPLE_BANK + i]
 
         # Play Gate
-        should_play = random.choices([False, True], weights=dists['play'])[0]
-        if not should_play:
-            return BayesianOutput(False, 0, 0, 0, 0, "Rest")
-
-        # Pitch Function
-        pf_val = random.choices(list(PitchFunc), weights=dists['pitch'])[0]
-
-        # Chord
-        c_enums = [ChordType.I, ChordType.IV, ChordType.V, ChordType.VI]
-        current_chord = random.choices(c_enums, weights=dists['chord'])[0]
+        if not outcome:
+            return _REST
 
-        # Energy
-        current_energy = random.choices(list(EnergyLevel), weights=dists['energy'])[0]
+        # 3. Decode the outcome (pitch and channel are already resolved)
+        final_pitch, is_high, final_channel, debug_info = _OUTCOMES[outcome]
 
-        # Channel
-        # Indices 0,1,2 map to MIDI 1,2,3
-        channel_idx = random.choices([0, 1, 2], weights=dists['channel'])[0]
-        final_channel = channel_idx + 1
-
-        # 4. Post-Processing Math (Deterministic)
-        # (This logic must live here because it depends on the specific random variables we just sampled)
-
-        # Velocity Math
-        energy_mult = 1.2 if current_energy == EnergyLevel.HIGH else 0.9
-        final_velocity = int(data.velocity * energy_mult)
-        if final_velocity > 127: final_velocity = 127
-
-        # Pitch Math
-        final_pitch = self._resolve_pitch(current_chord, pf_val, final_channel)
+        # 4. Velocity Math (depends on the raw input velocity, so it stays per call)
+        final_velocity = _VELOCITY_ROWS[is_high][data.velocity]
 
         return BayesianOutput(
             should_play=True,
@@ -142,45 +266,32 @@ class BakedBayesianGenerator:
             velocity=final_velocity,
             duration=0.5,
             channel=final_channel,
-            debug_info=f"{current_chord.name} -> {pf_val.name} (Baked)"
+            debug_info=debug_info
         )
 
-    def _resolve_pitch(self, chord: ChordType, func: PitchFunc, channel: int) -> int:
-
-        # 1. Determine Root Offset based on Chord
-        root_offset = 0
-        if chord == ChordType.IV:
-            root_offset = 5
-        elif chord == ChordType.V:
-            root_offset = 7
-        elif chord == ChordType.VI:
-            root_offset = 9
-
-        # 2. Determine Interval based on Pitch Function
-        interval = 0
-        if func == PitchFunc.THIRD_FIFTH:
-            interval = 4 if random.random() < 0.5 else 7
-        elif func == PitchFunc.COLOR:
-            r = random.random()
-            if r < 0.33:
-                interval = 2
-            elif r < 0.66:
-                interval = 11
-            else:
-                interval = 14
-
-        # 3. Calculate Base Pitch (Middle C approx)
-        base_pitch = 60 + root_offset + interval
-
-        # 4. Apply Channel Transposition
-        # Channel 1 (Bass) -> Down 2 octave (-24)
-        # Channel 2 (Mid) -> Down 1 octave
-        # Channel 3 (Lead) -> Up 2 octaves (+24)
-        if channel == 1:
-            base_pitch -= 24
-        elif channel == 2:
-            base_pitch -= 12
-        elif channel == 3:
-            base_pitch += 24
-
-        return base_pitch
\ No newline at end of file
+    def infer_batch(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of infer() for offline use and benchmarking.
+        Takes an (N, 4) int array of (drum_type, velocity, bar, step) rows and returns an
+        (N, 4) int array of (should_play, midi_note, velocity, channel). Rests are all zeros.
+        Draws fresh samples rather than consuming the per-key banks used by infer().
+        """
+        drums, velocities, bars, steps = inputs.T
+
+        # 1. Lookup Keys (anything outside the baked grid is a Rest, like infer())
+        in_grid = (bars > 0) & (bars < 5) & (steps > 0) & (steps < 17)
+        idx = np.where(in_grid, _key_index(bars, drums, (velocities > 90).astype(np.intp), steps), 0)
+        playable = in_grid & ~self._rest[idx]
+
+        # 2. Sample one fused outcome per row
+        # Counting cum entries <= r is searchsorted(side='right') over every row at once
+        r = self._rng.random((len(inputs), 1))
+        outcomes = np.where(playable, (r >= self._palette[self._slot[idx]]).sum(axis=1), 0)
+
+        # 3. Decode (outcome 0 is Rest and decodes to zeros)
+        out_velocities = _VELOCITY_ARRAY[_OUTCOME_HIGH[outcomes].astype(np.intp), velocities]
+
+        should_play = outcomes > 0
+        out = np.stack([should_play, _OUTCOME_NOTES[outcomes], out_velocities, _OUTCOME_CHANNELS[outcomes]], axis=1)
+        out[~should_play] = 0
+        return out
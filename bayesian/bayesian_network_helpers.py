@@ -1,5 +1,8 @@
 from dataclasses import dataclass
 from enum import IntEnum
+from typing import NamedTuple
+
+import numpy as np
 
 class DrumType(IntEnum):
     NONE = 0
@@ -33,22 +36,34 @@ class BeatType(IntEnum):
     SUBDIVISION = 2
 
 
+# Beat type of each 16th-note step (index = step - 1); the pattern repeats every 4 steps
+STEP_TO_BEAT = tuple(
+    BeatType.DOWNBEAT if step % 4 == 1 else BeatType.OFFBEAT if step % 2 == 1 else BeatType.SUBDIVISION
+    for step in range(1, 17)
+)
+
+
 class PitchFunc(IntEnum):
     ROOT = 0
     THIRD_FIFTH = 1
     COLOR = 2
 
 
-@dataclass
-class BayesianInput:
+class BayesianInput(NamedTuple):
     drum_type: DrumType
     velocity: int
     bar: int
     step: int
 
 
-@dataclass
+@dataclass(frozen=True)
 class BayesianOutput:
+    # Frozen so generators can hand out shared results (e.g. one Rest instance)
+    # without a caller being able to change them for everyone else.
+    # One is built per tick; slots drop the per-instance __dict__.
+    # Spelled out by hand because dataclass(slots=True) needs Python 3.10+.
+    __slots__ = ("should_play", "midi_note", "velocity", "duration", "channel", "debug_info")
+
     should_play: bool
     midi_note: int
     velocity: int
@@ -56,3 +71,107 @@ class BayesianOutput:
     channel: int
     debug_info: str
 
+
+# Velocity multiplier per EnergyLevel (only HIGH boosts)
+ENERGY_VELOCITY_MULT = (0.9, 0.9, 1.2)
+
+# [EnergyLevel][input velocity 0-127] -> min(int(velocity * mult), 127), so the
+# per-note velocity math is two tuple lookups (MIDI velocities are always 0-127)
+VELOCITY_TABLE = tuple(tuple(min(int(v * mult), 127) for v in range(128)) for mult in ENERGY_VELOCITY_MULT)
+
+# Root offset (semitones above C) for each chord
+CHORD_ROOT_OFFSETS = {ChordType.I: 0, ChordType.IV: 5, ChordType.V: 7, ChordType.VI: 9}
+
+# Candidate intervals above the root and their cumulative weights, per pitch function
+PITCH_INTERVALS = {
+    PitchFunc.ROOT: ((0,), (1.0,)),
+    PitchFunc.THIRD_FIFTH: ((4, 7), (0.5, 1.0)),
+    PitchFunc.COLOR: ((2, 11, 14), (0.33, 0.66, 1.0)),
+}
+
+
+def build_pitch_table(transpose: dict) -> dict:
+    """
+    Precomputes (Chord, PitchFunc, Channel) -> (notes, cum_weights) so pitch
+    resolution is one dict lookup plus a bisect over cum_weights.
+    `transpose` maps output channel (1-3) to its octave shift in semitones.
+    """
+    table = {}
+    for chord, root_offset in CHORD_ROOT_OFFSETS.items():
+        for func, (intervals, cum_weights) in PITCH_INTERVALS.items():
+            for channel, shift in transpose.items():
+                notes = tuple(60 + root_offset + interval + shift for interval in intervals)
+                table[(chord, func, channel)] = (notes, cum_weights)
+    return table
+
+
+def build_cpt_arrays() -> dict:
+    """
+    Builds the DrumGenie network's conditional probability tables as NumPy arrays,
+    keyed by node name. Array axes follow pyAgrum's cpt(node).toarray(): parents in
+    reverse arc order, the node itself last. Kept free of pyAgrum so the baked
+    generator can fingerprint the tables without building the network.
+    """
+    KICK, SNARE, RIM = DrumType.KICK, DrumType.SNARE, DrumType.RIM
+
+    # 1. DENSITY [Drum, Bar, Density] (48 cells)
+    dens = np.full((4, 4, 3), [0.33, 0.33, 0.34])
+    dens[KICK, 0:3] = [0.80, 0.15, 0.05]
+    dens[SNARE, 0:3] = [0.20, 0.70, 0.10]
+    dens[RIM, 0:3] = [0.10, 0.40, 0.50]
+    dens[KICK, 3] = [0.40, 0.40, 0.20]
+    dens[SNARE, 3] = [0.05, 0.25, 0.70]
+    dens[RIM, 3] = [0.05, 0.25, 0.70]
+
+    # 2. ENERGY [Density, In_Velocity, Energy] (18 cells)
+    en = np.empty((3, 2, 3))
+    en[DensityLevel.SPARSE, 0] = [0.95, 0.05, 0.00]
+    en[DensityLevel.MEDIUM, 0] = [0.80, 0.20, 0.00]
+    en[DensityLevel.BUSY, 0] = [0.60, 0.40, 0.00]
+    en[DensityLevel.SPARSE, 1] = [0.20, 0.70, 0.10]
+    en[DensityLevel.MEDIUM, 1] = [0.05, 0.50, 0.45]
+    en[DensityLevel.BUSY, 1] = [0.00, 0.10, 0.90]
+
+    # 3. CHORD [Bar, Chord] (4 rows * 4 values = 16 cells)
+    # Columns: I, IV, V, VI
+    ch = np.array([[0.95, 0.00, 0.05, 0.00],
+                   [0.10, 0.80, 0.05, 0.05],
+                   [0.90, 0.05, 0.05, 0.00],
+                   [0.05, 0.05, 0.85, 0.05]])
+
+    # 4. PLAY GATE [Beat_Type, Density, Drum, Play_Note]
+    # Sparse density plays 20% of the time, otherwise 80%; kicks on the downbeat
+    # almost always play and DrumType.NONE never does
+    p_play = np.empty((3, 3, 4))
+    p_play[:] = 0.8
+    p_play[:, DensityLevel.SPARSE, :] = 0.2
+    p_play[BeatType.DOWNBEAT, :, KICK] = 0.99
+    p_play[:, :, DrumType.NONE] = 0.0
+
+    # 5. PITCH FUNC [Beat_Type, Chord index, Pitch_Func] (36 cells)
+    pf = np.full((3, 4, 3), [0.30, 0.40, 0.30])
+    pf[BeatType.DOWNBEAT, 0] = [0.80, 0.15, 0.05]  # Chord I
+    pf[BeatType.OFFBEAT, 0] = [0.20, 0.60, 0.20]  # Chord I
+    pf[BeatType.DOWNBEAT, 2] = [0.50, 0.30, 0.20]  # Chord V
+
+    # 6. OUTPUT CHANNEL [Bar, Drum, Out_Channel] (NEW)
+    # Size: 4(Drum) * 4(Bar) * 3(Channel) = 48 cells
+    out = np.full((4, 4, 3), [1.0, 0.0, 0.0])  # Initialize Default to Ch1
+
+    # Kick (1) -> Always Ch1 (Bass)
+    # Rim (3) -> Always Ch3 (Lead)
+    # None (0) -> Don't care
+    out[:, RIM] = [0.0, 0.0, 1.0]
+
+    # Snare (2) Logic
+    out[0:3, SNARE] = [0.0, 0.90, 0.10]  # Bar 1-3: Mostly Ch2
+    out[3, SNARE] = [0.0, 0.40, 0.60]  # Bar 4: More Ch3
+
+    return {
+        'Density': dens,
+        'Energy': en,
+        'Chord': ch,
+        'Play_Note': np.stack([1.0 - p_play, p_play], axis=-1),
+        'Pitch_Func': pf,
+        'Out_Channel': out,
+    }
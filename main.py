@@ -1,6 +1,8 @@
 import mido
+import threading
 import time
-from datetime import datetime
+from array import array
+from collections import deque
 
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal, Vertical
@@ -15,6 +17,16 @@ from SettingsModal import SettingsScreen
 from tempo_engine import TempoEngine
 from ui_widgets import MetronomeDisplay
 
+# Capacity of the MIDI input ring (power of two, far more hits than fit in one 16th)
+MIDI_RING_SIZE = 256
+MIDI_RING_MASK = MIDI_RING_SIZE - 1
+
+# Ring slot layout: velocity << 8 | kick bit << 7 | DrumType.
+# Ordered like this, the plain int max() of a tick's hits is the loudest one,
+# and at equal velocity a Kick beats the other drums.
+HIT_KICK_BIT = 0x80
+HIT_TYPE_MASK = 0x7F
+
 
 class BayesianMidiPerformer(App):
 
@@ -26,15 +38,32 @@ class BayesianMidiPerformer(App):
         mido.set_backend('mido.backends.rtmidi')
         self.current_input_port = None
         self.current_output_port = None
-        self.processing_active = True
+        # Set on unmount; wakes the clock thread out of any wait so it exits at once
+        self.shutdown = threading.Event()
         self.clock_running = False
+        # Set by screens that define handle_midi_input (see SettingsScreen)
+        self.screen_handles_midi = False
+        # Wakes the idle clock thread as soon as playback starts
+        self.clock_started = threading.Event()
         self.tempo_engine = TempoEngine(bpm=120)
         self.bayesian_engine = bayesian.bayesian_network_ag_baked.BakedBayesianGenerator()
         self.settings = PerformanceSettings()
-        self.midi_buffer = []
+        # Single-producer (RtMidi thread) / single-consumer (clock thread) ring of
+        # packed hits (see HIT_KICK_BIT). Each side only writes its own index,
+        # so no lock is needed and nothing is allocated on the RtMidi thread.
+        self.midi_ring = array('H', [0]) * MIDI_RING_SIZE
+        self.midi_head = 0  # written by on_midi_message only
+        self.midi_tail = 0  # written by run_clock only
         self.midi_scheduler = MidiScheduler()
         self.last_beat_state = None
-        self.output_log_buffer = []
+        # Filled by the clock thread, drained by flush_logs on the main thread.
+        # Bounded so a hidden or slow log can never grow memory without limit.
+        self.output_log_buffer = deque(maxlen=500)
+        # (second, "HH:MM:SS") of the last formatted log timestamp, see _timestamp
+        self._ts_cache = (-1, "")
+        # Notes for the active screen, appended by the RtMidi thread and drained
+        # at 30 Hz by drain_ui_events instead of one call_from_thread per note
+        self.ui_events = deque(maxlen=256)
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
@@ -71,15 +100,17 @@ class BayesianMidiPerformer(App):
     def action_toggle_play(self) -> None:
         """Toggles Play Button. ALso Called when the user presses space."""
         self.clock_running = not self.clock_running
-        btn = self.query_one("#toggle_clock", Button)
+        btn = self._toggle_btn
 
         if self.clock_running:
             btn.label, btn.variant = "STOP", "error"
             self.tempo_engine.reset()
-            self.query_one("#output_log", RichLog).write("[bold green]▶ Performance Started[/]")
+            self.clock_started.set()
+            self._output_log.write("[bold green]▶ Performance Started[/]")
         else:
             btn.label, btn.variant = "START", "success"
-            self.query_one("#output_log", RichLog).write("[bold red]⏹ Performance Stopped[/]")
+            self.clock_started.clear()
+            self._output_log.write("[bold red]⏹ Performance Stopped[/]")
 
     def action_dispatch_midi(self, note: int) -> None:
         """
@@ -90,24 +121,31 @@ class BayesianMidiPerformer(App):
         if hasattr(self.screen, "handle_midi_input"):
             self.screen.handle_midi_input(note)
 
+    def drain_ui_events(self) -> None:
+        """Dispatches the notes queued by on_midi_message. Runs on the main thread via set_interval."""
+        events = self.ui_events
+        # Pop exactly what is queued now; later notes wait for the next tick
+        for _ in range(len(events)):
+            self.action_dispatch_midi(events.popleft())
+
     def get_midi_input_ports(self):
         try:
             inputs = mido.get_input_names()
             return [(name, name) for name in inputs] if inputs else [("No Ports", "none")]
-        except:
+        except Exception:
             return [("Error", "error")]
 
     def get_midi_output_ports(self):
         try:
             outputs = mido.get_output_names()
             return [(name, name) for name in outputs] if outputs else [("No Ports", "none")]
-        except:
+        except Exception:
             return [("Error", "error")]
 
     def on_select_changed(self, event: Select.Changed) -> None:
         if event.control.id == "bpm_selector":
             self.tempo_engine.set_bpm(int(event.value))
-            self.query_one("#input_log", RichLog).write(f"[b]Tempo set to {event.value}[/]")
+            self._input_log.write(f"[b]Tempo set to {event.value}[/]")
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "toggle_clock":
@@ -117,32 +155,58 @@ class BayesianMidiPerformer(App):
             self.push_screen(SettingsScreen())
 
     def on_mount(self):
+        # The layout is fixed, so resolve widgets once instead of on every tick / log line
+        self._metronome = self.query_one("#metronome_box", MetronomeDisplay)
+        self._output_log = self.query_one("#output_log", RichLog)
+        self._input_log = self.query_one("#input_log", RichLog)
+        self._status = self.query_one("#status_label", Static)
+        self._toggle_btn = self.query_one("#toggle_clock", Button)
+
+        self.set_interval(0.1, self.flush_logs)
+        self.set_interval(1 / 30, self.drain_ui_events)
         self.run_clock()
 
     @work(thread=True, exclusive=True)
     def run_clock(self):
-        while self.processing_active:
+        while not self.shutdown.is_set():
+            if not self.clock_running:
+                self.clock_started.wait(0.1)
+                continue
+
+            # Sleep until the next 16th is due instead of polling every millisecond.
+            # Stop and BPM changes are picked up on the following tick.
+            delay_ns = self.tempo_engine.next_deadline() - time.perf_counter_ns()
+            if delay_ns > 0:
+                self.shutdown.wait(delay_ns / 1e9)
+
             if self.clock_running and self.tempo_engine.check_tick():
                 steps = self.tempo_engine.step_count
                 bar = self.tempo_engine.bar_count + 1
-                beat = ((steps // 4) % 4) + 1
-                sub = steps % 4
+                # step_count is already 0-15, so the grid position falls straight out of it
+                beat = (steps >> 2) + 1
+                sub = steps & 3
 
                 # update GUI only if beat changes
                 current_beat_state = (beat, sub, bar)
 
                 if current_beat_state != self.last_beat_state:
-                    self.call_from_thread(self.query_one("#metronome_box", MetronomeDisplay).update_beat, beat, sub, bar)
+                    self.call_from_thread(self._metronome.update_beat, beat, sub, bar)
                     self.last_beat_state = current_beat_state
-                    #self.flush_logs()
 
                 # Network Logic
                 # Grab all notes that happened since the last tick
-                recent_events = self.midi_buffer[:]
-                self.midi_buffer.clear()  # Reset for next tick
-                self.process_bayesian_step(recent_events, beat, sub)
-
-            time.sleep(0.001 if self.clock_running else 0.1)
+                # (array slices are copied in C; two slices when the window wraps around)
+                ring = self.midi_ring
+                tail, head = self.midi_tail, self.midi_head
+                start, end = tail & MIDI_RING_MASK, head & MIDI_RING_MASK
+                if head == tail:
+                    recent_events = ()
+                elif start < end:
+                    recent_events = ring[start:end]
+                else:
+                    recent_events = ring[start:] + ring[:end]
+                self.midi_tail = head  # Reset for next tick
+                self.process_bayesian_step(recent_events, steps + 1)
 
     def set_midi_output_port(self, port_name):
         """Helper called by SettingsScreen to change output safely."""
@@ -151,64 +215,71 @@ class BayesianMidiPerformer(App):
         try:
             self.current_output_port = mido.open_output(port_name)
             self.midi_scheduler.set_port(self.current_output_port)
-            self.query_one("#output_log", RichLog).write(f"[green]Output connected: {port_name}[/]")
+            self._output_log.write(f"[green]Output connected: {port_name}[/]")
         except Exception as e:
-            self.query_one("#output_log", RichLog).write(f"[red]Error connecting output: {e}[/]")
+            self._output_log.write(f"[red]Error connecting output: {e}[/]")
 
     def start_midi_listener(self, port_name):
-        self.query_one("#status_label", Static).update(f"[green]Listening:\n{port_name}[/]")
+        self._status.update(f"[green]Listening:\n{port_name}[/]")
 
         if self.current_input_port:
             self.current_input_port.close()
         try:
             self.current_input_port = mido.open_input(port_name, callback=self.on_midi_message)
         except Exception as e:
-            self.query_one("#input_log", RichLog).write(f"[red]Error: {e}[/]")
+            self._input_log.write(f"[red]Error: {e}[/]")
 
     def on_midi_message(self, msg):
         """
         This runs on the high-priority RtMidi thread.
         Keep this function FAST. No sleeps, no complex logs.
         """
-        if msg.type == 'note_on':
-            # 1. Update UI (Thread-safe call required)
-            self.app.call_from_thread(self.action_dispatch_midi, msg.note)
+        # Stopped clock and no screen listening: nothing wants this message
+        if not (self.clock_running or self.screen_handles_midi) or msg.type != 'note_on':
+            return
 
-            # 2. Add to Buffer for Bayesian Engine
-            # List.append is thread-safe in Python (GIL protects atomic operations)
-            if self.clock_running:
+        # 1. Queue for the UI (drained on the main thread by drain_ui_events)
+        # Nothing is queued while no screen wants the note
+        if self.screen_handles_midi:
+            self.ui_events.append(msg.note)
+
+        # 2. Add to Ring for Bayesian Engine
+        # Publish the slot first, then the new head (a single int store under the GIL)
+        if self.clock_running:
+            head = self.midi_head
+            if head - self.midi_tail < MIDI_RING_SIZE:  # full: drop rather than overwrite unread hits
                 note_type = self.app.settings.identify(msg.note)
-                self.app.midi_buffer.append((note_type, msg.velocity))
+                kick_bit = HIT_KICK_BIT if note_type == DrumType.KICK else 0
+                self.midi_ring[head & MIDI_RING_MASK] = (msg.velocity << 8) | kick_bit | note_type
+                self.midi_head = head + 1
 
     def on_unmount(self):
-        self.processing_active = False
+        self.shutdown.set()
+        self.clock_started.set()  # release an idle clock thread too
         if self.current_input_port: self.current_input_port.close()
         if self.current_output_port: self.current_output_port.close()
 
-    def process_bayesian_step(self, recent_events, beat, sub):
+    def process_bayesian_step(self, recent_events, current_step):
         """
-        Called by the metronome every 16th note.
+        Called by the metronome every 16th note, with current_step in 1-16.
         2. Updates Bayesian State (Density/Energy).
         3. Infers output.
         """
 
         # 2. DETERMINE DOMINANT INPUT
         # If the drummer played a Kick AND a Snare, which one wins?
-        # Logic: Kicks take priority for downbeats, otherwise take the loudest.
+        # Logic: take the loudest; at equal velocity the Kick wins.
         dominant_drum = DrumType.NONE
         max_velocity = 0
 
         if recent_events:
-            # Simple logic: take the loudest hit
-            for d_type, vel in recent_events:
-                if vel > max_velocity:
-                    max_velocity = vel
-                    dominant_drum = d_type
+            # Hits are packed so the largest int is the winner (see HIT_KICK_BIT)
+            loudest = max(recent_events)
+            if loudest >> 8:  # a velocity-0 note_on is a note-off, never a hit
+                max_velocity = loudest >> 8
+                dominant_drum = DrumType(loudest & HIT_TYPE_MASK)
 
         # 3. BUILD EVIDENCE (Using your Chapter 5 Structure)
-        # Calculate Step (1-16) based on Beat (1-4) and Sub (0-3)
-        current_step = ((beat - 1) * 4) + sub + 1
-
         evidence = BayesianInput(
             drum_type=dominant_drum,
             velocity=max_velocity,
@@ -218,7 +289,6 @@ class BayesianMidiPerformer(App):
 
         # 4. INFER & ACT
         result = self.bayesian_engine.infer(evidence)
-        # self.call_from_thread(self.log_generation, result)
         if result.should_play is not True:
             return
 
@@ -229,18 +299,32 @@ class BayesianMidiPerformer(App):
                 channel=result.channel,
                 duration=result.duration
             )
+            # Only queues the line; flush_logs writes it from the main thread
+            self.log_generation(result)
         else:
             self.call_from_thread(self.log_error, "No Output selected!")
 
-    def log_generation(self, result: BayesianOutput) -> None:
+    def _timestamp(self) -> str:
         """
-        Updates the Output Log with the decision made by the Bayesian Engine.
-        Must be called via self.call_from_thread if used in a worker.
+        Returns the current wall-clock time as HH:MM:SS.
+        Only reformats when the second changes, so a burst of log lines shares one string.
         """
-        log_widget = self.query_one("#output_log", RichLog)
+        second = int(time.time())
+        cached_second, text = self._ts_cache
+        if second != cached_second:
+            lt = time.localtime(second)
+            text = f"{lt.tm_hour:02d}:{lt.tm_min:02d}:{lt.tm_sec:02d}"
+            # Single tuple store, so the clock and main threads never see a torn pair
+            self._ts_cache = (second, text)
+        return text
 
+    def log_generation(self, result: BayesianOutput) -> None:
+        """
+        Queues a line for the Output Log with the decision made by the Bayesian Engine.
+        Safe to call from the clock thread: it only appends to output_log_buffer.
+        """
         # Get current timestamp
-        timestamp = datetime.now().strftime("%H:%M:%S")
+        timestamp = self._timestamp()
 
         if result.should_play:
             # Format: [12:00:01] Kick -> I (Root) -> Note 60
@@ -258,26 +342,27 @@ class BayesianMidiPerformer(App):
 
     def flush_logs(self):
         # This runs on the Main Thread automatically via set_interval
-        if self.output_log_buffer:
-            log_widget = self.query_one("#output_log", RichLog)
+        buffer = self.output_log_buffer
+        if buffer:
+            log_widget = self._output_log
+
+            # Pop exactly what is queued now; lines the clock thread appends meanwhile
+            # stay for the next flush (join + clear() could drop them)
+            lines = [buffer.popleft() for _ in range(len(buffer))]
 
             # Join all pending messages into one write operation
             # This triggers only ONE layout calculation instead of N
-            batch_message = "\n".join(self.output_log_buffer)
-            log_widget.write(batch_message)
-
-            # Clear the queue
-            self.output_log_buffer.clear()
+            log_widget.write("\n".join(lines))
 
     def log_error(self, error_message: str) -> None:
         """
         Updates the Output Log with an error message.
         Must be called via self.call_from_thread if used in a worker.
         """
-        log_widget = self.query_one("#output_log", RichLog)
+        log_widget = self._output_log
 
         # Get current timestamp
-        timestamp = datetime.now().strftime("%H:%M:%S")
+        timestamp = self._timestamp()
 
         # Format: [12:00:01] ERROR my error message
         # We use [bold red] to make the error stand out
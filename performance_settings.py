@@ -1,26 +1,38 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-from bayesian.bayesian_network import DrumType
+from bayesian.bayesian_network_helpers import DrumType
 
 
-@dataclass
+@dataclass(frozen=True)
 class PerformanceSettings:
-    """Stores all configurable parameters for the performance."""
+    """
+    Stores all configurable parameters for the performance.
+    Immutable: the settings screen builds a new instance and swaps it in, so the
+    RtMidi thread never sees a half-updated mapping.
+    """
     kick_note: int = 60
     snare_note: int = 65
     rim_note: int = 67
 
+    # DrumType for every MIDI note 0-127 (index = note), built once since the note fields never change
+    _lut: tuple = field(default=(), init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        for note in (self.kick_note, self.snare_note, self.rim_note):
+            if not 0 <= note <= 127:
+                raise ValueError(f"MIDI note out of range (0-127): {note}")
+
+        lut = [DrumType.NONE] * 128
+        # Assigned lowest priority first, so if two notes collide Kick wins, then Snare
+        lut[self.rim_note] = DrumType.RIM
+        lut[self.snare_note] = DrumType.SNARE
+        lut[self.kick_note] = DrumType.KICK
+        # object.__setattr__ because the dataclass is frozen
+        object.__setattr__(self, "_lut", tuple(lut))
+
     def identify(self, note: int) -> DrumType:
         """
-        Returns the name of the instrument for a given MIDI note,
-        or None if the note is not mapped.
+        Returns the DrumType for a given MIDI note,
+        or DrumType.NONE if the note is not mapped.
         """
-
-        #TODO: is there a more elegant way to map?
-        if note == self.kick_note:
-            return DrumType.KICK
-        if note == self.snare_note:
-            return DrumType.SNARE
-        if note == self.rim_note:
-            return DrumType.RIM
-        return DrumType.NONE
\ No newline at end of file
+        return self._lut[note] if 0 <= note < 128 else DrumType.NONE
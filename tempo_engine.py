@@ -1,28 +1,37 @@
 import time
 
 class TempoEngine:
+    # All times are integer perf_counter_ns() values, so the tick grid never
+    # picks up floating point drift no matter how long the clock runs
     def __init__(self, bpm=120, steps_per_beat=4):
         self.bpm = bpm
         self.steps_per_beat = steps_per_beat
-        self.interval = (60.0 / self.bpm) / self.steps_per_beat
-        self.last_tick_time = time.perf_counter()
+        self.interval_ns = 60_000_000_000 // (self.bpm * self.steps_per_beat)
+        self.last_tick_ns = time.perf_counter_ns()
         self.step_count = 0
         self.bar_count = 0
+        self.dropped_ticks = 0  # ticks skipped because the clock woke up too late
 
     def set_bpm(self, new_bpm):
         self.bpm = new_bpm
-        self.interval = (60.0 / self.bpm) / self.steps_per_beat
+        self.interval_ns = 60_000_000_000 // (self.bpm * self.steps_per_beat)
+
+    def next_deadline(self):
+        """perf_counter_ns() time at which the next tick is due, so callers can sleep until then."""
+        return self.last_tick_ns + self.interval_ns
 
     def check_tick(self):
-        now = time.perf_counter()
-        if now - self.last_tick_time >= self.interval:
-            self.last_tick_time += self.interval
-            self.step_count = (self.step_count + 1) % (self.steps_per_beat*4)
-            if self.step_count == 0:
-                self.bar_count = (self.bar_count + 1) % 4
+        now = time.perf_counter_ns()
+        missed = (now - self.last_tick_ns) // self.interval_ns
+        if missed:
+            # If we woke up late, jump to the latest tick instead of replaying each one
+            self.last_tick_ns += missed * self.interval_ns
+            self.dropped_ticks += missed - 1
+            bars, self.step_count = divmod(self.step_count + missed, self.steps_per_beat*4)
+            self.bar_count = (self.bar_count + bars) % 4
             return True
         return False
 
     def reset(self):
         self.step_count = 0
-        self.last_tick_time = time.perf_counter()
\ No newline at end of file
+        self.last_tick_ns = time.perf_counter_ns()
\ No newline at end of file
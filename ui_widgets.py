@@ -1,7 +1,6 @@
 from textual.app import ComposeResult
-from textual.containers import Vertical, Container
-from textual.widgets import Digits, Input, Label
-from textual.containers import Horizontal
+from textual.containers import Vertical
+from textual.widgets import Digits, Label
 
 
 
@@ -16,20 +15,32 @@ class MetronomeDisplay(Vertical):
         yield Label("1", id="bar_digits")
         yield Digits("1", id="beat_digits")
 
+    # (beat text, border) for each of the 16 steps, index = (beat - 1) * 4 + sub.
+    # Downbeats flash the border (red on the One), everything else is solid green.
+    _STATES = tuple(
+        (str(beat), ("double", "red" if beat == 1 else "green") if sub == 0 else ("solid", "green"))
+        for beat in range(1, 5)
+        for sub in range(4)
+    )
+
+    def on_mount(self):
+        self._beat_digits = self.query_one("#beat_digits", Digits)
+        self._bar_label = self.query_one("#bar_digits", Label)
+        # What the two widgets currently show (both start at "1", see compose)
+        self._shown_beat = "1"
+        self._shown_bar = 1
+
     def update_beat(self, beat, sub, bar):
-        # Update the Big Number
-        self.query_one("#beat_digits", Digits).update(str(beat))
-        self.query_one("#bar_digits", Label).update(str(bar))
+        beat_text, border = self._STATES[(beat - 1) * 4 + sub]
 
-        # Highlight logic
-        color = "grey"
-        if sub == 0:
-            color = "green" if beat == 1 else "yellow"
+        # Update the Big Number, but only when it changes: the beat moves once
+        # every 4 ticks and the bar once every 16, and Digits re-renders all its glyphs
+        if beat_text != self._shown_beat:
+            self._shown_beat = beat_text
+            self._beat_digits.update(beat_text)
+        if bar != self._shown_bar:
+            self._shown_bar = bar
+            self._bar_label.update(str(bar))
 
         # Flash Border
-        if sub == 0:
-            border_col = "red" if beat == 1 else "green"
-            self.styles.border = ("double", border_col)
-        else:
-            self.styles.border = ("solid", "green")
-
+        self.styles.border = border
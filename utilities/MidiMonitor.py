@@ -1,71 +1,114 @@
 import mido
+import threading
 import time
-from datetime import datetime
+from collections import deque
 from textual.app import App, ComposeResult
-from textual.containers import Container, Horizontal, Vertical
-from textual.widgets import Header, Footer, Static, RichLog, Select, Label, Button
+from textual.containers import Horizontal, Vertical
+from textual.widgets import Header, Footer, Static, RichLog, Select, Label
 from textual import work
-from textual.reactive import reactive
+from textual.content import Content
 
 
 # --- 1. The Clock Logic (From previous discussion) ---
 class TempoEngine:
+    # Integer perf_counter_ns() times, so the tick grid never drifts
     def __init__(self, bpm=120, steps_per_beat=4):
         self.bpm = bpm
         self.steps_per_beat = steps_per_beat
-        self.interval = (60.0 / self.bpm) / self.steps_per_beat
-        self.last_tick_time = time.perf_counter()
+        self.interval_ns = 60_000_000_000 // (self.bpm * self.steps_per_beat)
+        self.last_tick_ns = time.perf_counter_ns()
         self.step_counter = 0
+        self.dropped_ticks = 0  # ticks skipped because the clock woke up too late
 
     def set_bpm(self, new_bpm):
         self.bpm = new_bpm
-        self.interval = (60.0 / self.bpm) / self.steps_per_beat
+        self.interval_ns = 60_000_000_000 // (self.bpm * self.steps_per_beat)
+
+    def next_deadline(self):
+        """perf_counter_ns() time at which the next tick is due, so callers can sleep until then."""
+        return self.last_tick_ns + self.interval_ns
 
     def check_tick(self):
         """Returns True if a 16th note tick just happened."""
-        now = time.perf_counter()
-        if now - self.last_tick_time >= self.interval:
-            self.last_tick_time += self.interval
-            self.step_counter += 1
+        now = time.perf_counter_ns()
+        missed = (now - self.last_tick_ns) // self.interval_ns
+        if missed:
+            # If we woke up late, jump to the latest tick instead of replaying each one
+            self.last_tick_ns += missed * self.interval_ns
+            self.step_counter += missed
+            self.dropped_ticks += missed - 1
             return True
         return False
 
 
+def _metronome_markup(beat, sub):
+    # Create a visual grid: [1] . . . [2] . . .
+    # Highlight the current beat
+
+    # Simple visual logic:
+    # If subdivision is 0 (Downbeat), use Big Number.
+    # Else, use small dot.
+
+    color = "grey"
+    if sub == 0:
+        color = "green" if beat == 1 else "yellow"
+        display_str = f"[{color} bold]BEAT {beat}[/]"
+        sub_display = "[b]O[/] . . ."
+    else:
+        display_str = f"[{color}]BEAT {beat}[/]"
+        # Visualizing 16th notes (0, 1, 2, 3)
+        dots = ["O", ".", ".", "."]
+        dots[sub] = f"[b {color}]X[/]"  # Highlight current 16th
+        sub_display = " ".join(dots)
+
+    return f"\n{display_str}\n\n{sub_display}"
+
+
+# Every (beat, sub) frame parsed once up front, so a tick never runs the markup parser
+_METRONOME_FRAMES = {
+    (beat, sub): Content.from_markup(_metronome_markup(beat, sub))
+    for beat in range(1, 5)
+    for sub in range(4)
+}
+
+# Border styles for the downbeat flash
+BORDER_ONE = ("double", "red")
+BORDER_BEAT = ("solid", "green")
+
+
 # --- 2. The Visual Metronome Widget ---
 class MetronomeDisplay(Static):
     """A large display for the current beat."""
 
-    # Reactive variables trigger a redraw when changed
-    current_beat = reactive(1)
-    current_sub = reactive(0)
+    # Plain attributes: _flush redraws once per frame itself, so reactive
+    # refresh/watch machinery would only add a second render path
+    current_beat = 1
+    current_sub = 0
 
-    def on_mount(self):
-        self.update_display()
+    # Latest (beat, sub) from the clock thread; a single tuple store, so no lock needed
+    pending_state = None
 
-    def watch_current_beat(self, old_val, new_val):
+    def on_mount(self):
         self.update_display()
+        # Render at most 60 times a second, however fast the clock ticks
+        self.set_interval(1 / 60, self._flush)
 
-    def update_display(self):
-        # Create a visual grid: [1] . . . [2] . . .
-        # Highlight the current beat
+    def _flush(self):
+        """Applies the newest pending beat state on the UI thread (skipped states are never drawn)."""
+        state = self.pending_state
+        if state is None:
+            return
+        self.pending_state = None
 
-        # Simple visual logic:
-        # If subdivision is 0 (Downbeat), use Big Number.
-        # Else, use small dot.
+        self.current_beat, self.current_sub = state
+        self.update_display()
 
-        color = "grey"
+        # Flash the border on the "One"
         if self.current_sub == 0:
-            color = "green" if self.current_beat == 1 else "yellow"
-            display_str = f"[{color} bold]BEAT {self.current_beat}[/]"
-            sub_display = "[b]O[/] . . ."
-        else:
-            display_str = f"[{color}]BEAT {self.current_beat}[/]"
-            # Visualizing 16th notes (0, 1, 2, 3)
-            dots = ["O", ".", ".", "."]
-            dots[self.current_sub] = f"[b {color}]X[/]"  # Highlight current 16th
-            sub_display = " ".join(dots)
+            self.styles.border = BORDER_ONE if self.current_beat == 1 else BORDER_BEAT
 
-        self.update(f"\n{display_str}\n\n{sub_display}")
+    def update_display(self):
+        self.update(_METRONOME_FRAMES[self.current_beat, self.current_sub])
 
 
 # --- 3. The Main App ---
@@ -106,8 +149,14 @@ class BayesianMidiPerformer(App):
     def __init__(self):
         super().__init__()
         self.current_port = None
-        self.processing_active = True
+        # Set on unmount; interrupts the clock thread's sleep so it exits at once
+        self.shutdown = threading.Event()
         self.tempo_engine = TempoEngine(bpm=120)
+        # (timestamp, msg) pairs from the RtMidi thread, written in one batch by _flush_logs.
+        # Bounded so a flood of messages can never grow memory without limit.
+        self._log_queue = deque(maxlen=2000)
+        # (second, "HH:MM:SS") of the last formatted timestamp, see _timestamp
+        self._ts_cache = (-1, "")
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
@@ -116,7 +165,8 @@ class BayesianMidiPerformer(App):
             # LEFT: Sidebar Controls
             with Vertical(id="sidebar"):
                 yield Label("MIDI Input:")
-                yield Select(options=self.get_midi_ports(), id="port_selector")
+                # Filled by load_ports once the OS has been asked, so first paint never waits on it
+                yield Select([], id="port_selector", prompt="Scanning ports...")
 
                 yield Label("\nTempo (BPM):")
                 # Simple BPM Toggle for demo (could be an input field)
@@ -137,11 +187,24 @@ class BayesianMidiPerformer(App):
 
         yield Footer()
 
+    # Own group: run_clock is exclusive in the default group and would cancel this
+    @work(thread=True, group="ports")
+    def load_ports(self):
+        """Enumerates MIDI inputs in a worker thread and hands the result back to the UI."""
+        self.call_from_thread(self.populate_ports, self.get_midi_ports())
+
+    def populate_ports(self, ports):
+        select = self.query_one("#port_selector", Select)
+        select.set_options(ports)
+        select.prompt = "Select Input"
+
     def get_midi_ports(self):
         try:
             inputs = mido.get_input_names()
             return [(name, name) for name in inputs] if inputs else [("No Ports", "none")]
-        except:
+        except Exception as e:
+            # Missing backend library, no MIDI subsystem, ... (runs in load_ports' worker)
+            self.call_from_thread(self._logs.write, f"[red]Error: {e}[/]")
             return [("Error", "error")]
 
     def on_select_changed(self, event: Select.Changed) -> None:
@@ -150,64 +213,85 @@ class BayesianMidiPerformer(App):
         elif event.control.id == "bpm_selector":
             new_bpm = int(event.value)
             self.tempo_engine.set_bpm(new_bpm)
-            self.query_one("#logs", RichLog).write(f"[b]Tempo set to {new_bpm}[/]")
+            self._logs.write(f"[b]Tempo set to {new_bpm}[/]")
 
     def on_mount(self):
+        # The layout is fixed, so resolve widgets once instead of per tick / per message
+        self._metro = self.query_one("#metronome_box", MetronomeDisplay)
+        self._logs = self.query_one("#logs", RichLog)
+        self._status = self.query_one("#status_label", Static)
+        self.set_interval(0.05, self._flush_logs)
+        self.load_ports()
         # Start the clock immediately when app starts
         self.run_clock()
 
     @work(thread=True, exclusive=True)
     def run_clock(self):
         """The Heartbeat Worker: Runs constantly to update the metronome."""
-        while self.processing_active:
+        while not self.shutdown.is_set():
+            # Sleep until the next 16th is due instead of polling every few milliseconds
+            delay_ns = self.tempo_engine.next_deadline() - time.perf_counter_ns()
+            if delay_ns > 0:
+                self.shutdown.wait(delay_ns / 1e9)
+
             if self.tempo_engine.check_tick():
                 # 1. Calculate Music State
                 # step_counter is total 16th notes.
                 # beat (1-4)
                 # sub (0-3)
+                # (4 steps per beat, 4 beats per bar: shifts and masks instead of // and %)
                 total_steps = self.tempo_engine.step_counter
-                beat_in_bar = ((total_steps // 4) % 4) + 1
-                subdivision = total_steps % 4
-
-                # 2. Update UI (Thread-safe)
-                metro = self.query_one("#metronome_box", MetronomeDisplay)
-                metro.current_beat = beat_in_bar
-                metro.current_sub = subdivision
+                beat_in_bar = ((total_steps >> 2) & 3) + 1
+                subdivision = total_steps & 3
 
-                # 3. Optional: Flash the border on the "One"
-                if subdivision == 0 and beat_in_bar == 1:
-                    self.call_from_thread(metro.styles.__setattr__, "border", "double red")
-                elif subdivision == 0:
-                    self.call_from_thread(metro.styles.__setattr__, "border", "solid green")
+                # 2. Hand the state to the UI (rendered by MetronomeDisplay._flush)
+                self._metro.pending_state = (beat_in_bar, subdivision)
 
-            # Tiny sleep to prevent CPU burn, but fast enough for 16th notes
-            time.sleep(0.002)
-
-    @work(thread=True, exclusive=True)
     def start_midi_listener(self, port_name):
-        self.call_from_thread(self.query_one("#status_label", Static).update, f"[green]Listening:\n{port_name}[/]")
+        self._status.update(f"[green]Listening:\n{port_name}[/]")
 
         if self.current_port: self.current_port.close()
 
         try:
-            with mido.open_input(port_name) as port:
-                self.current_port = port
-                for msg in port:
-                    if not self.processing_active: break
-
-                    # LOGGING
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-                    if msg.type == 'note_on':
-                        log_msg = f"[green]{timestamp} 🥁 NOTE {msg.note} (Vel {msg.velocity})[/]"
-                    else:
-                        log_msg = f"[dim]{timestamp} {msg}[/]"
-
-                    self.call_from_thread(self.query_one("#logs", RichLog).write, log_msg)
+            # RtMidi delivers messages on its own thread, so no listener worker is needed
+            self.current_port = mido.open_input(port_name, callback=self._on_midi_msg)
         except Exception as e:
-            self.call_from_thread(self.query_one("#logs", RichLog).write, f"[red]Error: {e}[/]")
+            self.current_port = None
+            self._logs.write(f"[red]Error: {e}[/]")
+
+    def _on_midi_msg(self, msg):
+        """Runs on the RtMidi thread for every incoming message."""
+        if self.shutdown.is_set(): return
+
+        # LOGGING (formatted later by _flush_logs, so messages pushed out of the
+        # bounded queue during a burst never pay for string formatting)
+        self._log_queue.append((self._timestamp(), msg))
+
+    @staticmethod
+    def _format_msg(timestamp, msg):
+        if msg.type == 'note_on':
+            return f"[green]{timestamp} 🥁 NOTE {msg.note} (Vel {msg.velocity})[/]"
+        return f"[dim]{timestamp} {msg}[/]"
+
+    def _timestamp(self):
+        """Current time as HH:MM:SS, only reformatted when the second changes."""
+        second = int(time.time())
+        cached_second, text = self._ts_cache
+        if second != cached_second:
+            text = time.strftime("%H:%M:%S", time.localtime(second))
+            self._ts_cache = (second, text)
+        return text
+
+    def _flush_logs(self):
+        """Formats every queued message and writes them to the RichLog in a single update (UI thread)."""
+        queue = self._log_queue
+        if queue:
+            # Pop exactly what is queued now; messages appended meanwhile wait for the next flush
+            fmt = self._format_msg
+            self._logs.write("\n".join([fmt(*queue.popleft()) for _ in range(len(queue))]))
 
     def on_unmount(self):
-        self.processing_active = False
+        self.shutdown.set()
         if self.current_port: self.current_port.close()
 
 